@@ -60,6 +60,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users',
     'store',
 ]
@@ -67,6 +68,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise right after SecurityMiddleware
+    'store.metrics.RequestMetricsMiddleware',  # Query count and timings of every page request
+    'store.routers.ReplicaRoutingMiddleware',  # Reads of the read-only pages from a replica
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,7 +82,7 @@ ROOT_URLCONF = 'agreefeed.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'store.metrics.TimedDjangoTemplates',  # DjangoTemplates that records render time
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -106,6 +109,65 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'agreefeed'),
         'HOST': os.environ.get('POSTGRES_HOST', 'db'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Check a reused connection is still alive before handing it out, so
+        # a restarted database costs a reconnect rather than a 500
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Connecting and authenticating to PostgreSQL costs more than most of our
+# queries, so a request should not open its own connection. By default each
+# gunicorn worker keeps a pool shared by its threads (and the per-request
+# threads of the async views): a request borrows a connection and gives it
+# back when it ends. Pools are per worker process: the database sees up to
+# workers x DB_POOL_MAX_SIZE connections. The counters of the pool are
+# logged with every request (see store.metrics).
+if os.environ.get('DB_POOL', 'True') == 'True':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Seconds before a connection is replaced, and before an idle
+            # one above min_size is closed
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        },
+    }
+else:
+    # Without the pool, keep each thread's connection open for this many
+    # seconds (0: a new connection for every request)
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# Read replicas, as POSTGRES_REPLICAS=host[:port[:name]],... (port and name
+# default to the primary's; host may be a socket directory). They become the
+# aliases replica1, replica2... with the primary's user and password. To
+# try the routing locally, point one at the primary's own database.
+STORE_READ_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICAS', '').split(',')), 1):
+    host, port, name = (replica.strip().split(':') + ['', ''])[:3]
+    STORE_READ_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        # Tests read the test database through it
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Sends the reads of STORE_REPLICA_VIEWS to STORE_READ_REPLICAS (store.routers)
+DATABASE_ROUTERS = ['store.routers.ReplicaRouter']
+
+# Shared by all gunicorn workers on the host, so one worker's invalidation is
+# seen by the others (the order form's product and customer lists, see store.caching)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / '.cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
@@ -150,7 +212,8 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # WhiteNoise configuration for serving static files in production
 STORAGES = {
     "default": {
-        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        # Uploads named after their contents, stored once (see store.storage)
+        "BACKEND": "store.storage.ContentAddressedStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -223,3 +286,56 @@ AUTHENTICATION_BACKENDS = [
     'users.backends.EmailBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
+# CustomUser.email is unique through its LOWER(email) constraint, which the
+# check does not recognize; both backends look users up through it
+SILENCED_SYSTEM_CHECKS = ['auth.W004']
+
+# Sessions are read from the cache and written through to the database, so
+# a page does not query django_session; EmailBackend caches the user the
+# same way (users.backends). Expired rows are pruned in the background
+# (users.signals) or with the prune_sessions command.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Store settings
+# How create_order takes products out of stock:
+#   'locking'     - SELECT ... FOR UPDATE all products, validate, then decrement
+#   'conditional' - UPDATE ... SET stock = stock - q WHERE stock >= q per product,
+#                   no preceding lock (faster for a few hot products)
+STORE_STOCK_RESERVATION = os.environ.get('STORE_STOCK_RESERVATION', 'locking')
+
+# Most queries a page may run (store.metrics.RequestMetricsMiddleware). Over budget
+# is logged as a warning, or raises when STORE_QUERY_BUDGETS_STRICT is on
+# (the check_query_budgets command turns it on). The session and the user
+# usually come from the cache; each budget leaves room for one of them to be
+# looked up, as on the first page after logging in. Only GET requests are
+# checked; form submissions write and are not pages.
+STORE_QUERY_BUDGETS = {
+    'store:dashboard': 5,
+    'store:order_list': 2,
+    'store:order_detail': 3,
+    'store:product_list': 2,
+    'store:customer_list': 2,
+    'store:customer_detail': 3,
+    'store:create_order': 3,
+    'store:customer_autocomplete': 3,
+}
+STORE_QUERY_BUDGETS_STRICT = os.environ.get('STORE_QUERY_BUDGETS_STRICT', 'False') == 'True'
+
+# Pages whose GET requests read from a replica when there are any
+# (STORE_READ_REPLICAS): they only read, and a few seconds of lag is harmless
+STORE_REPLICA_VIEWS = {
+    'store:dashboard',
+    'store:product_list',
+    'store:order_list',
+    'store:order_detail',
+    'store:customer_list',
+    'store:customer_detail',
+    'store:customer_autocomplete',
+    'store:export_orders',
+    'store:export_customers',
+    'store:customer_statement',
+}
+# After a request writes, the client's reads stay on the primary this many
+# seconds (a cookie), so it sees its own changes despite replication lag
+STORE_REPLICA_STICKY_SECONDS = int(os.environ.get('STORE_REPLICA_STICKY_SECONDS', 10))
+STORE_REPLICA_STICKY_COOKIE = 'primary_reads'
@@ -0,0 +1,91 @@
+"""gunicorn runtime profile of the store (see the Dockerfile).
+
+    gunicorn -c gunicorn.conf.py agreefeed.wsgi:application
+
+Workers and threads are sized from the CPUs the container may use; every
+setting can be overridden with the GUNICORN_* variables below or on the
+command line.
+"""
+import os
+from pathlib import Path
+
+
+def _cpu_count():
+    """CPUs this process may use: its affinity, capped by a cgroup CPU quota
+    (docker --cpus), which os.cpu_count() does not see"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    for path, parse in (
+        ('/sys/fs/cgroup/cpu.max', lambda text: text.split()),
+        ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', lambda text: [
+            text, Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text(),
+        ]),
+    ):
+        try:
+            quota, period = parse(Path(path).read_text().strip())
+            if quota not in ('max', '-1'):
+                cpus = min(cpus, max(int(quota) // int(period), 1))
+            break
+        except (OSError, ValueError):
+            continue
+    return cpus
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+cores = _cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+# The usual (2 x cores) + 1 processes: while one waits on PostgreSQL another
+# renders, so a slow report or export no longer holds up every other page.
+# The pages spend most of their time rendering in Python, where threads of
+# one process take turns on the GIL: under load 4 threads per worker halved
+# the median but doubled the p99 (bench_servers), so one thread is the
+# default; more only pay off for pages that mostly wait on I/O
+workers = _env_int('GUNICORN_WORKERS', 2 * cores + 1)
+threads = _env_int('GUNICORN_THREADS', 1)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Import Django, the settings and every app once in the master: workers
+# fork with all of it already loaded (and shared copy-on-write) instead of
+# each importing it again, which also makes recycled workers start at once
+preload_app = True
+
+# Replace each worker after about this many requests, so memory held by one
+# large page or export does not stay with it for good; the jitter keeps the
+# workers from all restarting at the same moment
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+# Traefik keeps connections open between requests
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+
+def when_ready(server):
+    """Warm the URL resolver and the template cache in the master before the
+    workers fork, so their first requests do not pay for it"""
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+    from django.urls import get_resolver
+
+    get_resolver()._populate()
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for template in Path(directory).rglob('*.html'):
+                try:
+                    engine.get_template(template.relative_to(directory).as_posix())
+                except (TemplateDoesNotExist, TemplateSyntaxError):
+                    # Fragments meant to be included in a particular context
+                    continue
+    # Nothing above should have touched the database, but a connection or
+    # pool opened in the master must never be shared by the forked workers:
+    # each of them opens its own
+    connections.close_all()
+    for connection in connections.all():
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+    server.log.info('Warmed URLs and templates for %s workers x %s threads', workers, threads)
@@ -1,16 +1,22 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .inventory import release_stock, sync_order_stock
 from .models import Product, Order, OrderItem, Customer
+from .reports import refresh_daily_sales_on_commit
 
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-    list_display = ['full_name', 'phone_number', 'get_total_debt', 'created_at']
+    list_display = ['full_name', 'phone_number', 'get_total_debt', 'order_count', 'last_order_at', 'created_at']
     list_filter = ['created_at']
     search_fields = ['full_name', 'phone_number']
-    
+    readonly_fields = ['total_debt', 'order_count', 'last_order_at', 'lifetime_spend']
+
     def get_total_debt(self, obj):
-        return f'{obj.get_total_debt()} ج.م'
+        return f'{obj.total_debt} ج.م'
     get_total_debt.short_description = 'إجمالي الديون'
+    get_total_debt.admin_order_field = 'total_debt'
 
 
 @admin.register(Product)
@@ -35,6 +41,7 @@ class OrderAdmin(admin.ModelAdmin):
     list_editable = ['status']
     inlines = [OrderItemInline]
     raw_id_fields = ['customer']
+    actions = ['cancel_orders']
 
     def get_customer_name(self, obj):
         return obj.customer.full_name if obj.customer else obj.customer_name
@@ -47,3 +54,35 @@ class OrderAdmin(admin.ModelAdmin):
     def get_remaining(self, obj):
         return f'{obj.get_remaining_amount()} ج.م'
     get_remaining.short_description = 'المتبقي'
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Runs for the change form and for list_editable, once the items are saved
+        order = form.instance
+        try:
+            with transaction.atomic():
+                sync_order_stock(order)
+        except ValidationError as e:
+            order.status = 'cancelled'
+            order.save(update_fields=['status'])
+            self.message_user(request, f'الطلب #{order.id} بقي ملغياً: {e.messages[0]}', messages.WARNING)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            release_stock(Order.objects.filter(pk=obj.pk))
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            release_stock(queryset)
+            super().delete_queryset(request, queryset)
+
+    @admin.action(description='إلغاء الطلبات المحددة وإعادة المخزون')
+    def cancel_orders(self, request, queryset):
+        with transaction.atomic():
+            release_stock(queryset)
+            cancelled = queryset.exclude(status='cancelled').update(status='cancelled')
+            # update() skips the post_save signal that keeps the rollup current
+            for day in queryset.dates('created_at', 'day'):
+                refresh_daily_sales_on_commit(day)
+        self.message_user(request, f'تم إلغاء {cancelled} طلب وإعادة المخزون بنجاح!', messages.SUCCESS)
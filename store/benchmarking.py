@@ -0,0 +1,324 @@
+import http.client
+import math
+import os
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .caching import PRODUCT_CATALOG, invalidate
+from .models import Customer, Order, Product
+from .pagination import KeysetPaginator
+
+
+def percentile(values, pct):
+    """The pct-th percentile (0-100) of values, by nearest rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean/max of a list of durations, in milliseconds"""
+    return {
+        'p50_ms': round(percentile(seconds, 50) * 1000, 2),
+        'p95_ms': round(percentile(seconds, 95) * 1000, 2),
+        'p99_ms': round(percentile(seconds, 99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(seconds) * 1000, 2) if seconds else 0.0,
+        'max_ms': round(max(seconds) * 1000, 2) if seconds else 0.0,
+    }
+
+
+# Store tables big enough that their queries must always go through an index
+CHECKED_TABLES = {'store_customer', 'store_product', 'store_order', 'store_orderitem'}
+# Pages that list a whole table on purpose, and the tables they may scan
+FULL_SCANS_ALLOWED = {
+    'create order form': {'store_customer', 'store_product'},  # every customer and in-stock product
+    # A tenth of the catalog is sold out, as many rows as the newest-first
+    # index would walk past; the planner picks either
+    'product list out_of_stock': {'store_product'},
+}
+
+# A private cache for runs in rolled back transactions: what they cache must
+# not outlive them in the shared cache, nor a warm shared cache hide their queries
+ISOLATED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'store-benchmark'},
+}
+
+
+def plan_problems(node, tables, problems=None):
+    """The sequential scans of ``tables`` and the on-disk sorts of an
+    EXPLAIN (FORMAT JSON) plan node"""
+    problems = [] if problems is None else problems
+    if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in tables:
+        problems.append(f"Seq Scan on {node['Relation Name']}")
+    if node.get('Sort Space Type') == 'Disk':
+        problems.append(f"{node['Sort Method']} sort on disk ({node.get('Sort Key')})")
+    for child in node.get('Plans', []):
+        plan_problems(child, tables, problems)
+    return problems
+
+
+def _url(name, params=None, **kwargs):
+    url = reverse(name, kwargs=kwargs)
+    return f'{url}?{urlencode(params)}' if params else url
+
+
+def page_scenarios():
+    """(label, view name, URL) of the store pages worth measuring, built
+    from the orders and customers in the database"""
+    # A customer with a phone number, for the phone searches
+    orders = Order.objects.filter(customer__phone_number__isnull=False)
+    order = orders.order_by('-created_at')[orders.count() // 2]
+    customer = order.customer
+    deep_cursor = KeysetPaginator(Order.objects.all(), '-created_at', 50).encode_cursor(order, 'next')
+
+    scenarios = [
+        ('dashboard', 'store:dashboard', {}),
+        ('dashboard today', 'store:dashboard', {'filter': 'today'}),
+        ('dashboard month', 'store:dashboard', {'filter': 'month'}),
+        ('dashboard page 20', 'store:dashboard', {'filter': 'month', 'page': '20'}),
+        ('order list', 'store:order_list', {}),
+        ('order list deep page', 'store:order_list', {'cursor': deep_cursor}),
+        ('order list cancelled', 'store:order_list', {'status': 'cancelled'}),
+        ('order list week', 'store:order_list', {'date': 'week'}),
+        ('order list oldest', 'store:order_list', {'sort': 'created_at'}),
+        # A whole name: the first names alone are shared by a large part of the customers
+        ('order list search', 'store:order_list', {'search': customer.full_name}),
+        ('customer list', 'store:customer_list', {}),
+        ('customer list newest', 'store:customer_list', {'sort': '-created_at'}),
+        ('customer list search', 'store:customer_list', {'search': customer.full_name}),
+        ('customer list phone', 'store:customer_list', {'search': customer.phone_number[-6:]}),
+        ('create order form', 'store:create_order', {}),
+        ('customer autocomplete', 'store:customer_autocomplete', {'q': customer.full_name.split()[0][:3]}),
+        ('customer autocomplete word', 'store:customer_autocomplete', {'q': customer.full_name.split()[-1]}),
+        ('customer autocomplete phone', 'store:customer_autocomplete', {'q': customer.phone_number[:5]}),
+    ]
+    for sort in ['-created_at', 'created_at', 'name', '-price', 'stock']:
+        scenarios.append((f'product list {sort}', 'store:product_list', {'sort': sort}))
+    for stock in ['in_stock', 'out_of_stock', 'low_stock']:
+        scenarios.append((f'product list {stock}', 'store:product_list', {'stock': stock}))
+
+    pages = [(label, name, _url(name, params)) for label, name, params in scenarios]
+    pages += [
+        ('order detail', 'store:order_detail', _url('store:order_detail', order_id=order.id)),
+        ('customer detail', 'store:customer_detail', _url('store:customer_detail', customer_id=customer.id)),
+    ]
+    return pages
+
+
+def logged_in_client():
+    """A test client logged in as a new staff user, for use inside a rolled back transaction"""
+    user = get_user_model().objects.create_user(email='bench@example.com', first_name='Bench', is_staff=True)
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def view_scenarios(client):
+    """(label, view name, method, prepare) of every store and users view.
+
+    ``prepare(n)`` returns the (client, URL, POST data) of the n-th request,
+    so requests that use something up (deleting an order, logging out) get
+    their own object each time. ``client`` is a logged in staff client, see
+    logged_in_client().
+    """
+    def get(url, request_client=client):
+        return lambda n: (request_client, url, None)
+
+    scenarios = [(label, name, 'get', get(url)) for label, name, url in page_scenarios()]
+
+    today = timezone.localdate()
+    order = Order.objects.order_by('-created_at').first()
+    customer, product = order.customer, Product.objects.order_by('-created_at').first()
+    # Customers with orders cannot be deleted, the form redirects them away
+    new_customer = Customer.objects.create(full_name='عميل بدون طلبات')
+    for label, name, params in [
+        ('dashboard week', 'store:dashboard', {'filter': 'week'}),
+        (
+            'dashboard custom',
+            'store:dashboard',
+            {'filter': 'custom', 'start_date': f'{today - timedelta(days=90)}', 'end_date': f'{today}'},
+        ),
+        ('add product form', 'store:add_product', {}),
+        ('import products form', 'store:import_products', {}),
+        ('customer create form', 'store:customer_create', {}),
+        ('profile', 'users:profile', {}),
+        ('export orders month', 'store:export_orders', {'filter': 'month'}),
+        ('export customers search', 'store:export_customers', {'search': customer.full_name.split()[0]}),
+    ]:
+        scenarios.append((label, name, 'get', get(_url(name, params))))
+    for label, name, kwargs in [
+        ('edit product form', 'store:edit_product', {'product_id': product.id}),
+        ('delete product form', 'store:delete_product', {'product_id': product.id}),
+        ('edit order form', 'store:edit_order', {'order_id': order.id}),
+        ('delete order form', 'store:delete_order', {'order_id': order.id}),
+        ('customer edit form', 'store:customer_edit', {'customer_id': customer.id}),
+        ('customer delete form', 'store:customer_delete', {'customer_id': new_customer.id}),
+        ('customer statement', 'store:customer_statement', {'customer_id': customer.id}),
+    ]:
+        scenarios.append((label, name, 'get', get(_url(name, **kwargs))))
+
+    # Orders placed by the benchmark never run short of stock
+    hot_products = list(Product.objects.order_by('id').values_list('id', flat=True)[:20])
+    Product.objects.filter(id__in=hot_products).update(stock=10 ** 9)
+    invalidate(PRODUCT_CATALOG)
+    for basket in (1, 5, 20):
+        data = {
+            'customer': customer.id,
+            'paid_amount': '0',
+            'notes': '',
+            'status': 'completed',
+            'product_id[]': hot_products[:basket],
+            'quantity[]': ['1'] * len(hot_products[:basket]),
+        }
+        scenarios.append((
+            f'create order {basket} items', 'store:create_order', 'post',
+            lambda n, data=data: (client, _url('store:create_order'), data),
+        ))
+
+    anonymous = Client()
+    login_user = get_user_model().objects.create_user(
+        email='bench-login@example.com', password=BENCH_PASSWORD, first_name='Bench'
+    )
+    scenarios.append(('login form', 'users:login', 'get', get(_url('users:login'), anonymous)))
+    scenarios.append((
+        'login', 'users:login', 'post',
+        lambda n: (Client(), _url('users:login'), {'username': login_user.email, 'password': BENCH_PASSWORD}),
+    ))
+
+    def logout(n):
+        logged_in = Client()
+        logged_in.force_login(login_user)
+        return logged_in, _url('users:logout'), {}
+
+    scenarios.append(('logout', 'users:logout', 'post', logout))
+
+    # Last, as it deletes the newest order every time
+    def delete_order(n):
+        newest = Order.objects.order_by('-created_at', '-id').values_list('id', flat=True).first()
+        return client, _url('store:delete_order', order_id=newest), {}
+
+    scenarios.append(('delete order', 'store:delete_order', 'post', delete_order))
+    return scenarios
+
+
+def compare_runs(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """Regressions of ``current`` against ``baseline`` (two bench_views results).
+
+    A view regresses when its p50 or p95 latency grew by more than
+    ``threshold`` (a fraction) and by at least ``min_delta_ms``, or when it
+    runs more queries than before.
+    """
+    regressions = []
+    for label, result in current['results'].items():
+        before = baseline['results'].get(label)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            old, new = before[metric], result[metric]
+            if new - old >= min_delta_ms and new > old * (1 + threshold):
+                regressions.append(f'{label}: {metric} {old} -> {new} (+{(new / old - 1) * 100 if old else 100:.0f}%)')
+        if result['queries'] > before['queries']:
+            regressions.append(f"{label}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+@contextmanager
+def running_server(command, port, startup_timeout=30, env=None):
+    """Run the app server ``command`` (listening on ``port``) in a subprocess
+    for the duration of the block, stopping it afterwards. ``env`` is added
+    to its environment."""
+    with tempfile.TemporaryFile() as output:
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+            stdout=output, stderr=subprocess.STDOUT,
+        )
+        try:
+            deadline = time.monotonic() + startup_timeout
+            while True:
+                if process.poll() is not None:
+                    output.seek(0)
+                    raise RuntimeError(f'{command[0]} exited: {output.read().decode(errors="replace")[-2000:]}')
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f'Nothing listening on port {port} after {startup_timeout}s')
+                    time.sleep(0.1)
+            yield process
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+def load_test(port, paths, duration, concurrency, headers=None):
+    """GET ``paths`` in turn from ``concurrency`` keep-alive connections
+    for ``duration`` seconds, as fast as the server answers.
+
+    Returns the request and error counts (any status but 200), throughput
+    in requests per second and the latency percentiles.
+    """
+    deadline = time.monotonic() + duration
+    latencies, errors = [], []
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine, failed = [], 0
+        n = offset
+        while time.monotonic() < deadline:
+            path = paths[n % len(paths)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                continue
+            mine.append(time.perf_counter() - started)
+        connection.close()
+        latencies.extend(mine)
+        errors.append(failed)
+
+    # Each client starts at another page, so slow and fast pages overlap
+    threads = [threading.Thread(target=client, args=(n * len(paths) // concurrency,)) for n in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        **latency_summary(latencies),
+    }
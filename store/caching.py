@@ -0,0 +1,144 @@
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Customer, Product
+from .search import aautocomplete, normalize_arabic
+
+# Names of the cached data, each with its own generation
+PRODUCT_CATALOG = 'products'
+CUSTOMER_PICKER = 'customers'
+
+# Entries outlive many generations; a bump makes them stale, not this
+CATALOG_TIMEOUT = 24 * 60 * 60
+# A rebuild that crashed frees the lock after this many seconds
+REBUILD_LOCK_TIMEOUT = 30
+# How long a request waits for another process to fill an empty cache
+REBUILD_WAIT = 2.0
+# Customer search results are reused this long; balances may lag by as much
+SUGGESTIONS_TIMEOUT = 30
+_POLL_INTERVAL = 0.05
+
+
+def _generation_key(name):
+    return f'store:generation:{name}'
+
+
+def _entry_key(name):
+    return f'store:catalog:{name}'
+
+
+def _lock_key(name):
+    return f'store:rebuild:{name}'
+
+
+def _new_generation(name):
+    # A random token rather than a counter: two processes bumping at once
+    # can never end up on the same generation
+    cache.set(_generation_key(name), uuid.uuid4().hex, None)
+
+
+def generation(name):
+    """The current generation token of ``name``, started when there is none"""
+    token = cache.get(_generation_key(name))
+    if token is None:
+        cache.add(_generation_key(name), uuid.uuid4().hex, None)
+        token = cache.get(_generation_key(name))
+    return token
+
+
+async def ageneration(name):
+    """generation() with the async cache API"""
+    token = await cache.aget(_generation_key(name))
+    if token is None:
+        await cache.aadd(_generation_key(name), uuid.uuid4().hex, None)
+        token = await cache.aget(_generation_key(name))
+    return token
+
+
+def invalidate(name):
+    """Start a new generation of the cached list ``name``.
+
+    Bumped right away and again once the transaction commits: a request
+    rebuilding in between still reads the old rows, and the second bump
+    makes that copy stale in turn.
+    """
+    _new_generation(name)
+    transaction.on_commit(lambda: _new_generation(name))
+
+
+def cached(name, build):
+    """The list ``name`` of the current generation, built with ``build()``
+    and shared by every worker process through the cache.
+
+    When the generation moved on, one process (the one taking the rebuild
+    lock) queries the database while the others keep serving the previous
+    copy, so a bump does not send every open order form to the database at
+    once. With nothing cached at all the others wait for that rebuild for
+    up to REBUILD_WAIT seconds before building it themselves.
+    """
+    generation_key, entry_key = _generation_key(name), _entry_key(name)
+    found = cache.get_many([generation_key, entry_key])
+    current = found.get(generation_key) or generation(name)
+    entry = found.get(entry_key)
+    if entry is not None and entry[0] == current:
+        return entry[1]
+
+    if cache.add(_lock_key(name), current, REBUILD_LOCK_TIMEOUT):
+        try:
+            # The generation was read before the rows, so a change committed
+            # meanwhile leaves this copy stale rather than current
+            data = build()
+            cache.set(entry_key, (current, data), CATALOG_TIMEOUT)
+        finally:
+            cache.delete(_lock_key(name))
+        return data
+
+    if entry is not None:
+        return entry[1]
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        entry = cache.get(entry_key)
+        if entry is not None and entry[0] == current:
+            return entry[1]
+    return build()
+
+
+def product_catalog():
+    """In-stock products offered on the order form, newest first"""
+    return cached(PRODUCT_CATALOG, lambda: list(
+        Product.objects.using(DEFAULT_DB_ALIAS).filter(stock__gt=0).values('id', 'name', 'price', 'stock')
+    ))
+
+
+async def acustomer_suggestions(query, limit):
+    """Customers matching ``query`` for the order form's customer search, as
+    JSON-ready dicts with their balance.
+
+    Cached per query for SUGGESTIONS_TIMEOUT seconds under the customer
+    generation, so added and renamed customers show up at once; read from
+    the primary, as a replica may not have them yet when the generation moves.
+    """
+    digest = hashlib.md5(normalize_arabic(query).encode()).hexdigest()
+    key = f'store:suggestions:{await ageneration(CUSTOMER_PICKER)}:{limit}:{digest}'
+    results = await cache.aget(key)
+    if results is None:
+        customers = await aautocomplete(
+            Customer.objects.using(DEFAULT_DB_ALIAS).only('id', 'full_name', 'phone_number', 'total_debt'),
+            query, 'search_name', 'search_phone', limit,
+        )
+        results = [
+            {
+                'id': customer.id,
+                'name': customer.full_name,
+                'phone': customer.phone_number or '',
+                'balance': str(customer.total_debt),
+            }
+            for customer in customers
+        ]
+        await cache.aset(key, results, SUGGESTIONS_TIMEOUT)
+    return results
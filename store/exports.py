@@ -0,0 +1,132 @@
+import csv
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+# Rows fetched per round trip of the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+# CSV rows joined into one chunk of the response
+ROWS_PER_WRITE = 500
+
+STATUS_LABELS = dict(Order.STATUS_CHOICES)
+
+ORDER_HEADER = [
+    'رقم الطلب', 'التاريخ', 'العميل', 'الهاتف', 'الحالة', 'المنتج', 'الكمية', 'سعر الوحدة',
+    'إجمالي البند', 'إجمالي الطلب', 'المدفوع', 'المتبقي', 'ملاحظات',
+]
+CUSTOMER_HEADER = [
+    'رقم العميل', 'الاسم الكامل', 'الهاتف', 'عدد الطلبات', 'إجمالي المشتريات', 'إجمالي الديون',
+    'تاريخ آخر طلب', 'تاريخ الإضافة',
+]
+STATEMENT_HEADER = ['التاريخ', 'رقم الطلب', 'الحالة', 'الإجمالي', 'المدفوع', 'المتبقي', 'الرصيد']
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def _text(value):
+    """A text cell, defused so spreadsheets do not run it as a formula"""
+    if not value:
+        return ''
+    return f"'{value}" if value[0] in '=+-@\t\r' else value
+
+
+def _datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def csv_response(filename, header, rows):
+    """Stream ``rows`` as a CSV download that starts before the rows are all read.
+
+    UTF-8 with a byte order mark, so spreadsheets show the Arabic text.
+    """
+    writer = csv.writer(_Echo())
+
+    def content():
+        lines = ['\ufeff' + writer.writerow(header)]
+        for row in rows:
+            lines.append(writer.writerow(row))
+            if len(lines) >= ROWS_PER_WRITE:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def order_rows(orders):
+    """One row per order item (one row for an order without items).
+
+    The orders are read as plain tuples through a server-side cursor and
+    the items of every chunk of orders are fetched with one query, so
+    memory stays flat however many years are exported.
+    """
+    orders = orders.values_list(
+        'id', 'created_at', 'customer__full_name', 'customer__phone_number', 'status',
+        'total_amount', 'paid_amount', 'remaining_amount', 'notes',
+    )
+    for batch in _batches(orders.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+        items = {}
+        for order_id, *item in (
+            OrderItem.objects.filter(order_id__in=[order[0] for order in batch])
+            .order_by('order_id', 'id')
+            .values_list('order_id', 'product__name', 'quantity', 'price')
+        ):
+            items.setdefault(order_id, []).append(item)
+
+        for order_id, created_at, name, phone, status, total, paid, remaining, notes in batch:
+            first = [order_id, _datetime(created_at), _text(name), _text(phone), STATUS_LABELS.get(status, status)]
+            totals = [total, paid, remaining, _text(notes)]
+            for product, quantity, price in items.get(order_id) or [('', '', '')]:
+                line_total = quantity * price if product else ''
+                yield [*first, _text(product), quantity, price, line_total, *totals]
+
+
+def customer_rows(customers):
+    """One row per customer with the stored summary of their orders"""
+    customers = customers.values_list(
+        'id', 'full_name', 'phone_number', 'order_count', 'lifetime_spend', 'total_debt', 'last_order_at', 'created_at',
+    )
+    for customer_id, name, phone, order_count, spend, debt, last_order_at, created_at in customers.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        yield [
+            customer_id, _text(name), _text(phone), order_count, spend, debt,
+            _datetime(last_order_at), _datetime(created_at),
+        ]
+
+
+def statement_rows(customer):
+    """The orders of ``customer`` oldest first, with the running balance of
+    what is left to pay; ends with the total row"""
+    orders = customer.orders.order_by('created_at', 'id').values_list(
+        'created_at', 'id', 'status', 'total_amount', 'paid_amount', 'remaining_amount'
+    )
+    balance = total_spent = total_paid = Decimal('0.00')
+    for created_at, order_id, status, total, paid, remaining in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        balance += remaining
+        total_spent += total
+        total_paid += paid
+        yield [_datetime(created_at), order_id, STATUS_LABELS.get(status, status), total, paid, remaining, balance]
+    yield ['الإجمالي', '', '', total_spent, total_paid, balance, balance]
@@ -57,10 +57,8 @@ class OrderForm(forms.ModelForm):
         model = Order
         fields = ['customer', 'paid_amount', 'notes', 'status']
         widgets = {
-            'customer': forms.Select(attrs={
-                'class': 'form-control',
-                'required': True
-            }),
+            # Picked through the customer search (customer_picker.html)
+            'customer': forms.HiddenInput(),
             'paid_amount': forms.NumberInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'المبلغ المدفوع',
@@ -149,3 +147,13 @@ class ProductForm(forms.ModelForm):
         if stock < 0:
             raise ValidationError('الكمية لا يمكن أن تكون سالبة.')
         return stock
+
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        label='ملف المنتجات',
+        widget=forms.FileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,text/csv'
+        })
+    )
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .storage import stored_hash
+
+logger = logging.getLogger('store.images')
+
+# Widths of the product thumbnails: a product card is up to about 440px
+# wide on desktop and the screen width on phones, at 1x to 2x density
+THUMBNAIL_WIDTHS = (320, 640, 960)
+# Width of the plain src, for browsers that ignore srcset
+DEFAULT_WIDTH = 640
+# Extension, Pillow format and encoder options of each derivative type
+THUMBNAIL_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 78, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Part of every derivative name; bump it after changing the settings above
+# (then run build_thumbnails --all) so browsers and caches never keep the
+# old files under the same URL
+THUMBNAIL_DIR = 'thumbs/v1'
+
+_HASH_CHUNK = 64 * 1024
+
+
+def content_hash(file):
+    """sha256 of the contents of ``file``, read in chunks unless the storage
+    named the file after it"""
+    image_hash = stored_hash(file.storage, file.name)
+    if image_hash:
+        return image_hash
+    digest = hashlib.sha256()
+    file.open('rb')
+    try:
+        file.seek(0)
+        for chunk in iter(lambda: file.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    finally:
+        file.close()
+    return digest.hexdigest()
+
+
+def thumbnail_name(image_hash, width, fmt):
+    """Storage name of the ``fmt`` thumbnail at ``width`` of the image with
+    contents ``image_hash``.
+
+    Named after the contents, so the same photo uploaded twice shares its
+    thumbnails and a file never changes once written.
+    """
+    extension = THUMBNAIL_FORMATS[fmt][0]
+    return f'{THUMBNAIL_DIR}/{image_hash[:2]}/{image_hash}-{width}.{extension}'
+
+
+def _open(file):
+    file.open('rb')
+    try:
+        image = Image.open(file)
+        # Let the JPEG decoder scale down by 1/2 to 1/8 while reading: a
+        # 4000px phone photo then never has to be decoded in full
+        image.draft('RGB', (max(THUMBNAIL_WIDTHS), max(THUMBNAIL_WIDTHS)))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    finally:
+        file.close()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def _encode(image, fmt):
+    _, pil_format, options = THUMBNAIL_FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode == 'RGBA':
+        # JPEG has no transparency: flatten on the white of the cards
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    output = io.BytesIO()
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def _store(storage, name, data):
+    saved = storage.save(name, ContentFile(data))
+    if saved != name:
+        # Another process wrote the same thumbnail meanwhile; the contents
+        # are the same, so keep that one
+        storage.delete(saved)
+
+
+def delete_thumbnails(storage, image_hash):
+    """Delete every thumbnail of the image with contents ``image_hash``"""
+    for width in THUMBNAIL_WIDTHS:
+        for fmt in THUMBNAIL_FORMATS:
+            storage.delete(thumbnail_name(image_hash, width, fmt))
+
+
+def build_thumbnails(file):
+    """Write the missing thumbnails of the image ``file`` (a FieldFile) in
+    every width and format and return its content hash.
+
+    Images narrower than a width are not enlarged; that thumbnail is the
+    image at its own size. Returns '' when the file is not an image Pillow
+    can read.
+    """
+    storage = file.storage
+    image_hash = content_hash(file)
+    missing = [
+        (width, fmt)
+        for width in THUMBNAIL_WIDTHS
+        for fmt in THUMBNAIL_FORMATS
+        if not storage.exists(thumbnail_name(image_hash, width, fmt))
+    ]
+    if not missing:
+        return image_hash
+
+    try:
+        image = _open(file)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('Cannot make thumbnails of %s: %s', file.name, e)
+        return ''
+
+    resized = {}
+    for width, fmt in missing:
+        if width not in resized:
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                resized[width] = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            else:
+                resized[width] = image
+        _store(storage, thumbnail_name(image_hash, width, fmt), _encode(resized[width], fmt))
+    return image_hash
@@ -0,0 +1,324 @@
+import csv
+import io
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import PRODUCT_CATALOG, invalidate
+from .search import normalize_arabic
+
+# Uploaded sheets wait here between the preview and the confirmation
+IMPORT_DIR = Path(settings.BASE_DIR) / 'imports'
+# Uploads never confirmed are removed after this many seconds
+IMPORT_MAX_AGE = 24 * 60 * 60
+# Changed rows and errors listed on the preview
+PREVIEW_ROWS = 200
+
+COLUMNS = ['id', 'name', 'description', 'price', 'stock']
+
+# Header spellings accepted for every column, compared after normalize_arabic
+HEADER_ALIASES = {
+    'id': ['id', 'رقم المنتج', 'الرقم', 'الكود', 'كود المنتج'],
+    'name': ['name', 'اسم المنتج', 'الاسم', 'المنتج'],
+    'description': ['description', 'الوصف', 'وصف المنتج'],
+    'price': ['price', 'السعر', 'سعر الوحدة'],
+    'stock': ['stock', 'الكمية', 'الكمية المتوفرة', 'المخزون'],
+}
+_HEADERS = {normalize_arabic(alias): column for column, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+# Arabic-Indic and Persian digits to ASCII, the Arabic decimal separator to a
+# dot and the Arabic thousands separator dropped. A comma is left alone (and
+# fails the pattern): 12,50 could mean 12.50 or 1250
+_DIGITS_FROM = '٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹٫٬'
+_DIGITS_TO = '01234567890123456789.'
+
+_STAGING_TABLE = """
+    CREATE TEMPORARY TABLE product_import (
+        line integer NOT NULL,
+        raw_id text,
+        name text,
+        description text,
+        price text,
+        stock text,
+        search_name text,
+        product_id bigint,
+        new_price numeric,
+        new_stock numeric,
+        error text,
+        action text
+    ) ON COMMIT DROP
+"""
+
+# The rules of ProductForm.clean_* (and the model fields), run over the whole
+# staging table at once. Every step only looks at rows without an error yet,
+# so each row reports its first problem. Casts happen in SET, never in WHERE,
+# so they only see values that passed their pattern.
+_VALIDATION = [
+    (
+        'UPDATE product_import SET raw_id = translate(raw_id, %s, %s), price = translate(price, %s, %s), '
+        'stock = translate(stock, %s, %s)',
+        [_DIGITS_FROM, _DIGITS_TO] * 3,
+    ),
+    # Rows naming an existing product by its number
+    (
+        r"UPDATE product_import SET error = %s WHERE raw_id IS NOT NULL AND raw_id !~ '^\d{1,18}$'",
+        ['رقم المنتج غير صحيح.'],
+    ),
+    (
+        'UPDATE product_import SET product_id = raw_id::bigint WHERE error IS NULL AND raw_id IS NOT NULL',
+        [],
+    ),
+    (
+        'UPDATE product_import s SET error = %s WHERE error IS NULL AND product_id IS NOT NULL '
+        'AND NOT EXISTS (SELECT 1 FROM store_product p WHERE p.id = s.product_id)',
+        ['لا يوجد منتج بهذا الرقم.'],
+    ),
+    # Rows without a number update the product of the same name, or add one
+    (
+        'UPDATE product_import SET error = %s WHERE error IS NULL AND raw_id IS NULL AND name IS NULL',
+        ['اسم المنتج مطلوب.'],
+    ),
+    (
+        'UPDATE product_import s SET product_id = CASE WHEN m.products = 1 THEN m.id END, '
+        'error = CASE WHEN m.products > 1 THEN %s END '
+        'FROM (SELECT name, min(id) AS id, count(*) AS products FROM store_product '
+        '      WHERE name IN (SELECT name FROM product_import WHERE raw_id IS NULL) GROUP BY name) m '
+        'WHERE s.error IS NULL AND s.raw_id IS NULL AND s.name = m.name',
+        ['يوجد أكثر من منتج بهذا الاسم، حدد رقم المنتج.'],
+    ),
+    # clean_name
+    (
+        'UPDATE product_import SET error = %s WHERE error IS NULL AND char_length(name) < 3',
+        ['اسم المنتج يجب أن يكون على الأقل 3 أحرف.'],
+    ),
+    (
+        'UPDATE product_import SET error = %s WHERE error IS NULL AND char_length(name) > 200',
+        ['اسم المنتج يجب ألا يزيد عن 200 حرف.'],
+    ),
+    # clean_price, within the 10 digits and 2 decimal places of the column
+    (
+        r"UPDATE product_import SET error = %s WHERE error IS NULL AND price !~ '^[+-]?(\d+\.?\d*|\.\d+)$'",
+        ['السعر يجب أن يكون رقماً.'],
+    ),
+    ('UPDATE product_import SET new_price = price::numeric WHERE error IS NULL AND price IS NOT NULL', []),
+    ('UPDATE product_import SET error = %s WHERE error IS NULL AND new_price <= 0', ['السعر يجب أن يكون أكبر من صفر.']),
+    (
+        'UPDATE product_import SET error = %s WHERE error IS NULL AND new_price <> round(new_price, 2)',
+        ['السعر لا يمكن أن يزيد عن رقمين بعد العلامة العشرية.'],
+    ),
+    (
+        'UPDATE product_import SET error = %s WHERE error IS NULL AND new_price >= 100000000',
+        ['السعر أكبر من الحد المسموح.'],
+    ),
+    # clean_stock, within the positive integer column
+    (
+        r"UPDATE product_import SET error = %s WHERE error IS NULL AND stock !~ '^[+-]?\d+$'",
+        ['الكمية يجب أن تكون عدداً صحيحاً.'],
+    ),
+    ('UPDATE product_import SET new_stock = stock::numeric WHERE error IS NULL AND stock IS NOT NULL', []),
+    ('UPDATE product_import SET error = %s WHERE error IS NULL AND new_stock < 0', ['الكمية لا يمكن أن تكون سالبة.']),
+    (
+        'UPDATE product_import SET error = %s WHERE error IS NULL AND new_stock > 2147483647',
+        ['الكمية أكبر من الحد المسموح.'],
+    ),
+    # A new product needs every field; an existing one keeps what is left empty
+    (
+        'UPDATE product_import SET error = CASE '
+        'WHEN description IS NULL THEN %s WHEN new_price IS NULL THEN %s WHEN new_stock IS NULL THEN %s END '
+        'WHERE error IS NULL AND product_id IS NULL',
+        ['الوصف مطلوب.', 'السعر مطلوب.', 'الكمية مطلوبة.'],
+    ),
+    # One row per product, or the merge could not tell which one wins
+    (
+        "UPDATE product_import s SET error = format(%s, d.first_line) "
+        "FROM (SELECT line, min(line) OVER (PARTITION BY coalesce(product_id::text, 'new:' || name)) AS first_line "
+        "      FROM product_import WHERE error IS NULL) d "
+        "WHERE s.line = d.line AND d.line > d.first_line",
+        ['المنتج مكرر في الملف (السطر %s).'],
+    ),
+    (
+        "UPDATE product_import s SET action = CASE "
+        "    WHEN s.product_id IS NULL THEN 'insert' "
+        "    WHEN EXISTS (SELECT 1 FROM store_product p WHERE p.id = s.product_id AND ("
+        "        s.name <> p.name OR s.description <> p.description "
+        "        OR s.new_price <> p.price OR s.new_stock <> p.stock)) THEN 'update' "
+        "    ELSE 'unchanged' END "
+        "WHERE s.error IS NULL",
+        [],
+    ),
+]
+
+# Inserts and updates in one statement; empty cells keep the current values
+_MERGE = """
+    MERGE INTO store_product AS p
+    USING (SELECT * FROM product_import WHERE action IN ('insert', 'update')) AS s
+    ON p.id = s.product_id
+    WHEN MATCHED THEN UPDATE SET
+        name = coalesce(s.name, p.name),
+        search_name = coalesce(s.search_name, p.search_name),
+        description = coalesce(s.description, p.description),
+        price = coalesce(s.new_price, p.price),
+        stock = coalesce(s.new_stock, p.stock),
+        updated_at = %(now)s
+    WHEN NOT MATCHED THEN INSERT (name, search_name, description, image, image_hash, price, stock, created_at, updated_at)
+        VALUES (s.name, s.search_name, s.description, NULL, '', s.new_price, s.new_stock, %(now)s, %(now)s)
+"""
+
+
+def _decode(data):
+    """Text of an uploaded sheet: UTF-8 (with or without a byte order mark),
+    else Windows Arabic, which Excel uses when saving CSV on Arabic Windows"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        try:
+            return data.decode('cp1256')
+        except UnicodeDecodeError:
+            raise ValidationError('تعذر قراءة الملف. احفظه بصيغة CSV UTF-8.')
+
+
+def read_csv(data):
+    """Rows of the CSV file in ``data`` (bytes) as (line, {column: value}),
+    with values stripped and empty cells as None"""
+    text = _decode(data)
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(text), dialect)
+
+    header = next(reader, None)
+    if not header:
+        raise ValidationError('الملف فارغ.')
+    positions = {}
+    for position, title in enumerate(header):
+        column = _HEADERS.get(normalize_arabic(title))
+        if column is None:
+            continue
+        if column in positions:
+            raise ValidationError(f'العمود "{title.strip()}" مكرر في الملف.')
+        positions[column] = position
+    if 'id' not in positions and 'name' not in positions:
+        raise ValidationError('يجب أن يحتوي الملف على عمود رقم المنتج أو اسم المنتج.')
+
+    rows = []
+    for row in reader:
+        values = {}
+        for column, position in positions.items():
+            value = row[position].strip() if position < len(row) else ''
+            values[column] = value or None
+        if any(values.values()):
+            rows.append((reader.line_num, values))
+    if not rows:
+        raise ValidationError('لا توجد صفوف في الملف.')
+    return rows
+
+
+def stage(cursor, rows):
+    """Load ``rows`` into the product_import temporary table with COPY"""
+    cursor.execute(_STAGING_TABLE)
+    with cursor.copy(
+        'COPY product_import (line, raw_id, name, description, price, stock, search_name) '
+        'FROM STDIN WITH (FORMAT csv)'
+    ) as copy:
+        writer = csv.writer(copy)
+        for line, values in rows:
+            writer.writerow([line, *(values.get(column) for column in COLUMNS), normalize_arabic(values.get('name'))])
+    # Temporary tables are never analyzed on their own
+    cursor.execute('ANALYZE product_import')
+
+
+def validate(cursor):
+    for sql, params in _VALIDATION:
+        cursor.execute(sql, params)
+
+
+def preview(cursor, limit=PREVIEW_ROWS):
+    """Counts of what the import would do, with the first changed rows and errors"""
+    cursor.execute(
+        "SELECT coalesce(action, 'error'), count(*) FROM product_import GROUP BY 1"
+    )
+    counts = {'insert': 0, 'update': 0, 'unchanged': 0, 'error': 0, **dict(cursor.fetchall())}
+
+    cursor.execute(
+        'SELECT s.line, s.action, s.product_id, p.name, coalesce(s.name, p.name), p.price, '
+        '       coalesce(s.new_price, p.price), p.stock, coalesce(s.new_stock, p.stock), '
+        '       s.description IS NOT NULL AND s.description IS DISTINCT FROM p.description '
+        'FROM product_import s LEFT JOIN store_product p ON p.id = s.product_id '
+        "WHERE s.action IN ('insert', 'update') ORDER BY s.line LIMIT %s",
+        [limit],
+    )
+    changes = [
+        {
+            'line': line, 'action': action, 'product_id': product_id, 'old_name': old_name, 'name': name,
+            'old_price': old_price, 'price': price, 'old_stock': old_stock, 'stock': int(stock),
+            'description_changed': description_changed,
+        }
+        for line, action, product_id, old_name, name, old_price, price, old_stock, stock, description_changed
+        in cursor.fetchall()
+    ]
+
+    cursor.execute(
+        'SELECT line, coalesce(name, raw_id), error FROM product_import WHERE error IS NOT NULL ORDER BY line LIMIT %s',
+        [limit],
+    )
+    errors = [{'line': line, 'product': product, 'error': error} for line, product, error in cursor.fetchall()]
+    return {'counts': counts, 'changes': changes, 'errors': errors}
+
+
+def import_products(data, apply=False):
+    """Validate the product sheet in ``data`` (CSV bytes) and, with ``apply``
+    and no errors, add and update the products in one MERGE.
+
+    Returns the preview with ``applied`` and ``seconds``. Nothing is written
+    when the sheet has errors or without ``apply``; ValidationError is raised
+    for a file that cannot be read at all.
+    """
+    started = time.perf_counter()
+    rows = read_csv(data)
+    with transaction.atomic(), connection.cursor() as cursor:
+        stage(cursor, rows)
+        validate(cursor)
+        result = preview(cursor)
+        result['applied'] = apply and not result['counts']['error']
+        if result['applied']:
+            cursor.execute(_MERGE, {'now': timezone.now()})
+            invalidate(PRODUCT_CATALOG)
+        # ON COMMIT DROP does not fire when the block is a savepoint in an outer transaction
+        cursor.execute('DROP TABLE product_import')
+        if not result['applied']:
+            transaction.set_rollback(True)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def save_upload(upload):
+    """Keep an uploaded sheet until it is confirmed; returns its token"""
+    IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    expired = time.time() - IMPORT_MAX_AGE
+    for path in IMPORT_DIR.glob('*.csv'):
+        if path.stat().st_mtime < expired:
+            path.unlink(missing_ok=True)
+
+    token = uuid.uuid4().hex
+    with open(IMPORT_DIR / f'{token}.csv', 'wb') as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+    return token
+
+
+def upload_path(token):
+    """Path of the sheet saved under ``token``; ValidationError once it is gone"""
+    try:
+        token = uuid.UUID(token).hex
+    except (TypeError, ValueError):
+        raise ValidationError('الملف غير موجود، يرجى رفعه مرة أخرى.')
+    path = IMPORT_DIR / f'{token}.csv'
+    if not path.exists():
+        raise ValidationError('الملف غير موجود، يرجى رفعه مرة أخرى.')
+    return path
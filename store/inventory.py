@@ -0,0 +1,179 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .caching import PRODUCT_CATALOG, invalidate
+from .models import Order, OrderItem, Product
+
+RESERVATION_STRATEGIES = ('locking', 'conditional')
+
+
+def _stock_delta(quantities):
+    """CASE expression mapping each product id to its quantity"""
+    return Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _missing_product(product_id):
+    return ValidationError(f'المنتج برقم {product_id} غير موجود.')
+
+
+def _insufficient_stock(product, quantity):
+    return ValidationError(
+        f'الكمية المطلوبة من "{product.name}" غير متوفرة. '
+        f'المطلوب: {quantity}، المتوفر: {product.stock}'
+    )
+
+
+def _take_stock_with_locks(quantities):
+    """Lock all products in id order, validate in memory, decrement in one UPDATE"""
+    products = {
+        product.id: product
+        for product in Product.objects.select_for_update().filter(id__in=quantities).order_by('id')
+    }
+
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            raise _missing_product(product_id)
+        if not product.has_stock(quantity):
+            raise _insufficient_stock(product, quantity)
+
+    Product.objects.filter(id__in=quantities).update(stock=F('stock') - _stock_delta(quantities))
+    invalidate(PRODUCT_CATALOG)
+    return products
+
+
+def _take_stock_conditionally(quantities):
+    """Decrement each product with a conditional UPDATE, without a preceding lock.
+
+    ``UPDATE ... SET stock = stock - q WHERE id = ? AND stock >= q`` is
+    re-checked by the database against the latest committed row, so an
+    affected-row count of 0 means the product ran short and nothing can be
+    oversold. Products are updated in id order to keep the implicit row
+    locks deadlock-free.
+    """
+    # Names and prices for the order items; read without a lock
+    products = Product.objects.in_bulk(list(quantities))
+
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        if product_id not in products:
+            raise _missing_product(product_id)
+        updated = Product.objects.filter(id=product_id, stock__gte=quantity).update(
+            stock=F('stock') - quantity
+        )
+        if not updated:
+            # The stock read above may be older than the row the UPDATE saw
+            product = products[product_id]
+            try:
+                product.refresh_from_db(fields=['stock'])
+            except Product.DoesNotExist:
+                raise _missing_product(product_id)
+            raise _insufficient_stock(product, quantity)
+
+    invalidate(PRODUCT_CATALOG)
+    return products
+
+
+def reserve_stock(order, quantities, strategy=None):
+    """Add the products in ``quantities`` ({product id: quantity}) to ``order``
+    and take them out of stock.
+
+    With the default 'locking' strategy all products are locked with one
+    SELECT ... FOR UPDATE ORDER BY id, so concurrent orders always lock in
+    the same order and cannot deadlock. Stock is validated in memory and
+    decremented with one UPDATE. The 'conditional' strategy skips the lock
+    and relies on conditional UPDATEs instead (see settings
+    STORE_STOCK_RESERVATION). Either way the items are inserted with one
+    bulk_create.
+
+    Must be called inside transaction.atomic(); raises ValidationError
+    (leaving the caller to roll back) when a product is missing or short.
+    """
+    strategy = strategy or settings.STORE_STOCK_RESERVATION
+    if strategy == 'conditional':
+        products = _take_stock_conditionally(quantities)
+    elif strategy == 'locking':
+        products = _take_stock_with_locks(quantities)
+    else:
+        raise ValueError(f'Unknown stock reservation strategy: {strategy!r}')
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=products[product_id], quantity=quantity, price=products[product_id].price)
+        for product_id, quantity in quantities.items()
+    ])
+
+    # bulk_create skips OrderItem.save(), so refresh the stored totals once
+    order.update_totals()
+
+
+def _lock_products(product_ids):
+    """Lock product rows in id order, the same order reserve_stock uses"""
+    list(Product.objects.select_for_update().filter(id__in=product_ids).order_by('id').values_list('id', flat=True))
+
+
+def release_stock(orders):
+    """Put the items of ``orders`` (a queryset) back in stock.
+
+    Orders whose stock was already released are skipped and the rest are
+    marked as released, so calling this twice never restores twice. The
+    quantities of all lines of all orders are grouped per product and
+    restored with one UPDATE ... SET stock = stock + CASE ..., which keeps
+    releasing 500 orders down to a handful of statements.
+
+    Must be called inside transaction.atomic(). Returns the number of
+    orders released.
+    """
+    order_ids = list(
+        Order.objects.filter(id__in=orders.values('id'), stock_released=False)
+        .select_for_update()
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    if not order_ids:
+        return 0
+
+    quantities = dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by()
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values_list('product', 'total')
+    )
+    if quantities:
+        _lock_products(quantities)
+        Product.objects.filter(id__in=quantities).update(stock=F('stock') + _stock_delta(quantities))
+        invalidate(PRODUCT_CATALOG)
+
+    Order.objects.filter(id__in=order_ids).update(stock_released=True)
+    return len(order_ids)
+
+
+def reclaim_stock(order):
+    """Take the items of an order whose stock was released out of stock again.
+
+    Must be called inside transaction.atomic(); raises ValidationError when
+    a product no longer has enough stock.
+    """
+    quantities = dict(order.items.values_list('product', 'quantity'))
+    if quantities:
+        _take_stock_with_locks(quantities)
+    Order.objects.filter(pk=order.pk).update(stock_released=False)
+    order.stock_released = False
+
+
+def sync_order_stock(order):
+    """Release or reclaim the stock of ``order`` to match its status.
+
+    Cancelling an order puts its items back in stock; reopening a cancelled
+    order takes them out again. Must be called inside transaction.atomic().
+    """
+    if order.status == 'cancelled' and not order.stock_released:
+        release_stock(Order.objects.filter(pk=order.pk))
+        order.stock_released = True
+    elif order.status != 'cancelled' and order.stock_released:
+        reclaim_stock(order)
@@ -0,0 +1,137 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils import timezone
+
+from store.benchmarking import load_test, page_scenarios, running_server
+from store.models import Order
+
+from .bench_views import _revision
+
+# gunicorn arguments of each server; {defaults} is an empty config file, as
+# gunicorn would otherwise pick up gunicorn.conf.py from the project
+SERVERS = {
+    # The plain command the Dockerfile ran before gunicorn.conf.py: one sync worker
+    'wsgi': ['-c', '{defaults}', 'agreefeed.wsgi:application'],
+    # The same with uvicorn workers (the ASGI profile of the README)
+    'asgi': ['-c', '{defaults}', '--worker-class', 'uvicorn_worker.UvicornWorker', 'agreefeed.asgi:application'],
+    # The production profile: workers and threads sized from the CPUs
+    'tuned': ['-c', 'gunicorn.conf.py', 'agreefeed.wsgi:application'],
+}
+
+# Database connection handling to run the servers with (see DATABASES in
+# the settings); without --connections they use the configured one
+CONNECTIONS = {
+    # A new connection for every request
+    'new': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '0'},
+    # One connection per thread, kept open
+    'persistent': {'DB_POOL': 'False', 'DB_CONN_MAX_AGE': '60'},
+    # A pool per worker shared by its threads
+    'pooled': {'DB_POOL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the store pages through real app servers under the same concurrent load: '
+        'gunicorn with its defaults (one sync worker), with uvicorn workers (ASGI) and with '
+        'the gunicorn.conf.py profile. Reports throughput and latency percentiles. Runs '
+        'against the configured database, which needs orders (see seed_store).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', action='append', choices=list(SERVERS), help='Servers to test (default: all)')
+        parser.add_argument(
+            '--connections', action='append', choices=list(CONNECTIONS),
+            help='Database connection handling to run every server with (default: as configured)',
+        )
+        parser.add_argument(
+            '--workers', type=int, help='Worker processes of every server (default: what each one configures)'
+        )
+        parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous connections (default: 16)')
+        parser.add_argument('--duration', type=float, default=20, help='Measured seconds per server (default: 20)')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds first (default: 5)')
+        parser.add_argument('--port', type=int, default=8765, help='Port the servers listen on (default: 8765)')
+        parser.add_argument(
+            '--history-dir',
+            default=str(Path(settings.BASE_DIR) / 'benchmarks'),
+            help='Where results are saved (default: benchmarks/)',
+        )
+        parser.add_argument('--no-save', action='store_true', help='Do not save the results')
+
+    def handle(self, *args, **options):
+        if min(options['workers'] or 1, options['concurrency']) < 1 or options['duration'] <= 0:
+            raise CommandError('--workers, --concurrency and --duration must be positive.')
+        if not Order.objects.exists():
+            raise CommandError('There are no orders to load test with; run seed_store first.')
+
+        paths = [url for label, view_name, url in page_scenarios()]
+        user, _ = get_user_model().objects.get_or_create(
+            email='bench-servers@example.com', defaults={'first_name': 'Bench', 'is_staff': True}
+        )
+        client = Client()
+        client.force_login(user)
+        session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        headers = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}',
+            # As sent by the TLS-terminating proxy, so no HTTPS redirect
+            'X-Forwarded-Proto': 'https',
+        }
+
+        defaults = tempfile.NamedTemporaryFile('w', suffix='.py')
+        results = {}
+        try:
+            for server in options['server'] or list(SERVERS):
+                arguments = [argument.format(defaults=defaults.name) for argument in SERVERS[server]]
+                command = [sys.executable, '-m', 'gunicorn', *arguments, '--bind', f"127.0.0.1:{options['port']}"]
+                if options['workers']:
+                    command += ['--workers', str(options['workers'])]
+                for connections in options['connections'] or [None]:
+                    name = f'{server}/{connections}' if connections else server
+                    self.stdout.write(f'{name}: gunicorn {" ".join(arguments)}')
+                    with running_server(command, options['port'], env=CONNECTIONS.get(connections)):
+                        load_test(options['port'], paths, options['warmup'], options['concurrency'], headers)
+                        results[name] = load_test(
+                            options['port'], paths, options['duration'], options['concurrency'], headers
+                        )
+                    self.report(name, results[name])
+        finally:
+            defaults.close()
+            Session.objects.filter(session_key=session_key).delete()
+            user.delete()
+
+        if len(results) > 1:
+            baseline, *others = results
+            for server in others:
+                ratio = results[server]['throughput_rps'] / (results[baseline]['throughput_rps'] or 1)
+                self.stdout.write(f'{server} throughput is {ratio:.2f}x {baseline}.')
+
+        if not options['no_save']:
+            history = Path(options['history_dir'])
+            history.mkdir(parents=True, exist_ok=True)
+            run = {
+                'revision': _revision(),
+                'created_at': timezone.now().isoformat(),
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'pages': len(paths),
+                'results': results,
+            }
+            path = history / f"servers-{timezone.now():%Y%m%d-%H%M%S}-{run['revision']}.json"
+            path.write_text(json.dumps(run, indent=2))
+            self.stdout.write(f'Saved {path}')
+
+    def report(self, server, result):
+        self.stdout.write(
+            f"  {result['requests']:,} requests, {result['errors']} errors, {result['throughput_rps']:.1f} req/s  "
+            f"p50 {result['p50_ms']:.1f}ms  p95 {result['p95_ms']:.1f}ms  p99 {result['p99_ms']:.1f}ms  "
+            f"max {result['max_ms']:.1f}ms"
+        )
@@ -0,0 +1,176 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from store.benchmarking import latency_summary
+from store.inventory import RESERVATION_STRATEGIES, reserve_stock
+from store.models import Customer, Order, OrderItem, Product
+
+BENCH_PREFIX = '[bench] '
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the stock reservation strategies: many threads place orders '
+        'for the same hot products, then stock is checked for overselling. '
+        'Run against a real PostgreSQL database; it creates and removes its own data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=[*RESERVATION_STRATEGIES, 'both'], default='both')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent clerks (default: 16)')
+        parser.add_argument('--orders', type=int, default=2000, help='Orders to attempt per run (default: 2000)')
+        parser.add_argument('--products', type=int, default=3, help='Hot products shared by all orders (default: 3)')
+        parser.add_argument('--basket', type=int, default=2, help='Lines per order (default: 2)')
+        parser.add_argument(
+            '--stock',
+            type=int,
+            help='Starting stock per product (default: enough for about 80%% of the demand, so some orders fail)',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['basket'] > options['products']:
+            raise CommandError('--basket cannot be larger than --products.')
+
+        strategies = RESERVATION_STRATEGIES if options['strategy'] == 'both' else [options['strategy']]
+        for strategy in strategies:
+            self.run(strategy, options)
+
+    def run(self, strategy, options):
+        threads = options['threads']
+        total_orders = options['orders']
+        basket = options['basket']
+        rng = random.Random(options['seed'])
+
+        # Every order takes 1-3 units of `basket` random hot products
+        plans = [
+            {product_index: rng.randint(1, 3) for product_index in rng.sample(range(options['products']), basket)}
+            for _ in range(total_orders)
+        ]
+        demand = sum(sum(plan.values()) for plan in plans)
+        stock = options['stock'] if options['stock'] is not None else int(demand * 0.8 / options['products'])
+
+        customers, products = self.create_fixtures(threads, options['products'], stock)
+        product_ids = [product.id for product in products]
+        queue = list(reversed(plans))
+        queue_lock = threading.Lock()
+        latencies, placed, short, errors = [], [], [0], []
+        results_lock = threading.Lock()
+
+        def clerk(customer):
+            try:
+                while True:
+                    with queue_lock:
+                        if not queue:
+                            return
+                        plan = queue.pop()
+                    quantities = {product_ids[index]: quantity for index, quantity in plan.items()}
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            order = Order.objects.create(customer=customer, notes=BENCH_PREFIX)
+                            reserve_stock(order, quantities, strategy=strategy)
+                        outcome = 'placed'
+                    except ValidationError:
+                        outcome = 'short'
+                    except Exception as exc:  # deadlocks, serialization failures, ...
+                        outcome = 'error'
+                        with results_lock:
+                            errors.append(repr(exc))
+                    elapsed = time.perf_counter() - started
+                    with results_lock:
+                        latencies.append(elapsed)
+                        if outcome == 'placed':
+                            placed.append(quantities)
+                        elif outcome == 'short':
+                            short[0] += 1
+            finally:
+                connection.close()
+
+        self.stdout.write(
+            f'\n{strategy}: {threads} threads, {total_orders} orders of {basket} lines '
+            f'over {len(products)} products with {stock} units each'
+        )
+        # One customer per clerk, so only the products are contended
+        workers = [threading.Thread(target=clerk, args=(customer,)) for customer in customers]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - started
+
+        try:
+            self.report(strategy, wall, latencies, placed, short[0], errors, products, stock)
+        finally:
+            self.remove_fixtures(customers, products)
+
+    def report(self, strategy, wall, latencies, placed, short, errors, products, stock):
+        summary = latency_summary(latencies)
+        self.stdout.write(
+            f'  placed {len(placed)}, short {short}, errors {len(errors)} in {wall:.2f}s '
+            f'-> {len(placed) / wall:.1f} orders/s, {len(latencies) / wall:.1f} attempts/s'
+        )
+        self.stdout.write(
+            f"  latency p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, "
+            f"p99 {summary['p99_ms']}ms, max {summary['max_ms']}ms"
+        )
+        for error in errors[:5]:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+
+        # Proof of no overselling: stock never negative, and what left the
+        # shelf equals what the committed orders hold, product by product.
+        sold_by_clerks = {}
+        for quantities in placed:
+            for product_id, quantity in quantities.items():
+                sold_by_clerks[product_id] = sold_by_clerks.get(product_id, 0) + quantity
+        sold_in_orders = dict(
+            OrderItem.objects.filter(product__in=products)
+            .values('product')
+            .annotate(total=Sum('quantity'))
+            .values_list('product', 'total')
+        )
+        consistent = True
+        for product in Product.objects.filter(id__in=[product.id for product in products]):
+            taken = stock - product.stock
+            ok = (
+                product.stock >= 0
+                and taken == sold_by_clerks.get(product.id, 0) == sold_in_orders.get(product.id, 0)
+            )
+            consistent &= ok
+            self.stdout.write(
+                f'  {product.name}: stock {stock} -> {product.stock}, '
+                f'in orders {sold_in_orders.get(product.id, 0)} {"OK" if ok else "MISMATCH"}'
+            )
+        if consistent:
+            self.stdout.write(self.style.SUCCESS(f'  {strategy}: no overselling'))
+        else:
+            self.stdout.write(self.style.ERROR(f'  {strategy}: stock does not match the placed orders'))
+
+    def create_fixtures(self, customer_count, product_count, stock):
+        customers = [
+            Customer.objects.get_or_create(full_name=f'{BENCH_PREFIX}عميل {index + 1}')[0]
+            for index in range(customer_count)
+        ]
+        products = [
+            Product.objects.create(
+                name=f'{BENCH_PREFIX}علف {index + 1}',
+                description='benchmark',
+                price=Decimal('100.00'),
+                stock=stock,
+            )
+            for index in range(product_count)
+        ]
+        return customers, products
+
+    def remove_fixtures(self, customers, products):
+        Order.objects.filter(customer__in=customers, notes=BENCH_PREFIX).delete()
+        Product.objects.filter(id__in=[product.id for product in products]).delete()
+        Customer.objects.filter(id__in=[customer.id for customer in customers], orders__isnull=True).delete()
@@ -0,0 +1,194 @@
+import json
+import logging
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from store.benchmarking import (
+    ISOLATED_CACHES, compare_runs, latency_summary, logged_in_client, view_scenarios,
+)
+from store.seeding import StoreSeeder
+
+EXPECTED_STATUS = {'get': 200, 'post': 302}
+
+
+def _revision():
+    """Short git revision of the working tree, '-dirty' when it has changes"""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        changes = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{revision}-dirty' if changes else revision
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every store and users view through the test client on a seeded '
+        'dataset: p50/p95/p99 latency, queries per request and peak memory. Results '
+        'are saved as JSON and compared with the previous run; slowdowns over the '
+        'threshold fail the command. Everything runs in one transaction that is rolled '
+        'back, so on-commit work (the daily sales refresh) is not measured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=5000, help='Customers to seed (default: 5000)')
+        parser.add_argument('--products', type=int, default=500, help='Products to seed (default: 500)')
+        parser.add_argument('--orders', type=int, default=50000, help='Orders to seed (default: 50000)')
+        parser.add_argument(
+            '--items-per-order',
+            type=float,
+            default=2.7,
+            help='Average number of lines per order (default: 2.7)',
+        )
+        parser.add_argument('--days', type=int, default=730, help='Spread the orders over N days (default: 730)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=30, help='Measured requests per view (default: 30)')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per view first (default: 3)')
+        parser.add_argument('--only', action='append', help='Only the views whose label contains this (repeatable)')
+        parser.add_argument(
+            '--history-dir',
+            default=str(Path(settings.BASE_DIR) / 'benchmarks'),
+            help='Where results are saved and the baseline is found (default: benchmarks/)',
+        )
+        parser.add_argument('--baseline', help='Results file to compare with (default: the latest in --history-dir)')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20,
+            help='Flag views whose p50 or p95 latency grew by more than this percentage (default: 20)',
+        )
+        parser.add_argument(
+            '--min-delta-ms',
+            type=float,
+            default=1.0,
+            help='Ignore latency changes smaller than this, in milliseconds (default: 1.0)',
+        )
+        parser.add_argument('--no-save', action='store_true', help='Do not save the results')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+
+        history = Path(options['history_dir'])
+        baseline_path = Path(options['baseline']) if options['baseline'] else self.latest_run(history)
+
+        dataset = {key: options[key] for key in ('customers', 'products', 'orders', 'items_per_order', 'days', 'seed')}
+        # One log line per request would be measured too
+        metrics_logger = logging.getLogger('store.metrics')
+        level = metrics_logger.level
+        metrics_logger.setLevel(logging.WARNING)
+        try:
+            results = self.benchmark(dataset, options)
+        finally:
+            metrics_logger.setLevel(level)
+
+        run = {
+            'revision': _revision(),
+            'created_at': timezone.now().isoformat(),
+            'dataset': dataset,
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if not options['no_save']:
+            history.mkdir(parents=True, exist_ok=True)
+            path = history / f"views-{timezone.now():%Y%m%d-%H%M%S}-{run['revision']}.json"
+            path.write_text(json.dumps(run, indent=2, ensure_ascii=False))
+            self.stdout.write(f'Saved {path}')
+
+        self.compare(baseline_path, run, options)
+
+    def benchmark(self, dataset, options):
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver'], CACHES=ISOLATED_CACHES):
+            self.stdout.write('Seeding...')
+            StoreSeeder(**dataset).run()
+            scenarios = view_scenarios(logged_in_client())
+            if options['only']:
+                scenarios = [s for s in scenarios if any(part in s[0] for part in options['only'])]
+            results = {}
+            for label, view_name, method, prepare in scenarios:
+                results[label] = self.measure(view_name, method, prepare, options['iterations'], options['warmup'])
+                self.report(label, results[label])
+            transaction.set_rollback(True)
+        return results
+
+    def latest_run(self, history):
+        runs = sorted(history.glob('views-*.json'))
+        return runs[-1] if runs else None
+
+    def measure(self, view_name, method, prepare, iterations, warmup):
+        requests = iter(range(warmup + iterations + 1))
+
+        def send(client, url, data):
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+            if response.status_code != EXPECTED_STATUS[method]:
+                raise CommandError(f'{method.upper()} {url} answered {response.status_code}')
+            return elapsed
+
+        for _ in range(warmup):
+            send(*prepare(next(requests)))
+
+        latencies, queries = [], []
+        for _ in range(iterations):
+            request = prepare(next(requests))
+            with CaptureQueriesContext(connection) as captured:
+                latencies.append(send(*request))
+            queries.append(len(captured))
+
+        # One more request, traced on its own as tracing slows everything down
+        request = prepare(next(requests))
+        tracemalloc.start()
+        try:
+            send(*request)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'view': view_name,
+            'method': method.upper(),
+            **latency_summary(latencies),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def report(self, label, result):
+        self.stdout.write(
+            f"{label:<32} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  {result['queries']:>3} queries  {result['peak_memory_kb']:>8.1f} KiB"
+        )
+
+    def compare(self, baseline_path, run, options):
+        if baseline_path is None:
+            self.stdout.write('No earlier run to compare with.')
+            return
+        baseline = json.loads(Path(baseline_path).read_text())
+        if baseline['dataset'] != run['dataset']:
+            self.stdout.write(self.style.WARNING(
+                f'{baseline_path} was run on a different dataset, not comparing.'
+            ))
+            return
+
+        regressions = compare_runs(baseline, run, options['threshold'] / 100, options['min_delta_ms'])
+        self.stdout.write(f"Compared with {baseline_path} ({baseline['revision']}).")
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f'  {regression}'))
+            raise CommandError(f'{len(regressions)} regressions over the {options["threshold"]:g}% threshold.')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Make the WebP and JPEG thumbnails of product images (see store.images). '
+        'By default only images without thumbnails; --all also writes the files missing '
+        'for the others, e.g. after a change of the thumbnail settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Check every product image, not only new ones')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_hash')
+        if not options['all']:
+            products = products.filter(image_hash='')
+
+        done = failed = 0
+        for product in products.order_by('id').iterator(chunk_size=200):
+            product.refresh_thumbnails()
+            if product.image_hash:
+                done += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'  #{product.id}: cannot read {product.image.name}'))
+
+        self.stdout.write(self.style.SUCCESS(f'Thumbnails ready for {done} products.'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} images could not be read.'))
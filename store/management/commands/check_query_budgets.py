@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from store.benchmarking import ISOLATED_CACHES, logged_in_client, page_scenarios
+from store.metrics import QueryBudgetExceeded
+from store.seeding import StoreSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway dataset and load every store page with the query '
+        'budgets of STORE_QUERY_BUDGETS enforced; fails when a page runs more '
+        'queries than its budget. Everything runs in one transaction that is rolled back. '
+        'The store tests run the same check on a small dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=2000, help='Customers to seed (default: 2000)')
+        parser.add_argument('--products', type=int, default=500, help='Products to seed (default: 500)')
+        parser.add_argument('--orders', type=int, default=10000, help='Orders to seed (default: 10000)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if 'store.metrics.RequestMetricsMiddleware' not in settings.MIDDLEWARE:
+            raise CommandError('store.metrics.RequestMetricsMiddleware is not installed.')
+
+        over_budget = []
+        with transaction.atomic(), override_settings(
+            ALLOWED_HOSTS=['testserver'], CACHES=ISOLATED_CACHES, STORE_QUERY_BUDGETS_STRICT=True
+        ):
+            self.stdout.write('Seeding...')
+            StoreSeeder(options['customers'], options['products'], options['orders'], seed=options['seed']).run()
+            client = logged_in_client()
+
+            for label, view_name, url in page_scenarios():
+                budget = settings.STORE_QUERY_BUDGETS.get(view_name)
+                try:
+                    response = client.get(url)
+                except QueryBudgetExceeded as e:
+                    over_budget.append(label)
+                    self.stdout.write(self.style.ERROR(f'{label}: {e}'))
+                    continue
+                queries = response.wsgi_request.metrics.queries
+                self.stdout.write(f'{label}: {queries} queries (budget: {budget or "none"})')
+            transaction.set_rollback(True)
+
+        if over_budget:
+            raise CommandError(f'{len(over_budget)} pages are over their query budget.')
+        self.stdout.write(self.style.SUCCESS('All pages are within their query budgets.'))
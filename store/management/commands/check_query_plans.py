@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from store.benchmarking import (
+    CHECKED_TABLES, FULL_SCANS_ALLOWED, ISOLATED_CACHES, logged_in_client, page_scenarios, plan_problems,
+)
+from store.seeding import StoreSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large throwaway dataset, EXPLAIN ANALYZE every query the store '
+        'pages issue and fail if a plan uses a sequential scan of a store table '
+        'or an on-disk sort. Everything runs in one transaction that is rolled back. '
+        'The store tests only check that an index can serve each query; this checks the planner picks it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=20000, help='Customers to seed (default: 20000)')
+        parser.add_argument('--products', type=int, default=2000, help='Products to seed (default: 2000)')
+        parser.add_argument('--orders', type=int, default=100000, help='Orders to seed (default: 100000)')
+        parser.add_argument('--days', type=int, default=730, help='Spread the orders over N days (default: 730)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--show-plans', action='store_true', help='Print the plan of every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans can only be checked on PostgreSQL.')
+
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver'], CACHES=ISOLATED_CACHES):
+            self.stdout.write('Seeding...')
+            StoreSeeder(
+                options['customers'], options['products'], options['orders'], days=options['days'], seed=options['seed']
+            ).run()
+            failures = self.check_pages(options['show_plans'])
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{failures} queries have a regressed plan.')
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes.'))
+
+    def check_pages(self, show_plans):
+        client = logged_in_client()
+        failures = 0
+
+        for label, view_name, url in page_scenarios():
+            tables = CHECKED_TABLES - FULL_SCANS_ALLOWED.get(label, set())
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{label}: {url} answered {response.status_code}')
+
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}')
+                    explain = cursor.fetchone()[0]
+                    if isinstance(explain, str):
+                        explain = json.loads(explain)
+                plan = explain[0]
+                problems = plan_problems(plan['Plan'], tables)
+                if show_plans or problems:
+                    self.stdout.write(f"\n{label} ({plan['Execution Time']:.1f} ms): {sql[:300]}")
+                if show_plans:
+                    self.stdout.write(json.dumps(plan['Plan'], indent=2, ensure_ascii=False))
+                if problems:
+                    failures += 1
+                    for problem in problems:
+                        self.stdout.write(self.style.ERROR(f'  {problem}'))
+            self.stdout.write(f'{label}: {len(queries)} queries checked')
+
+        return failures
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store.imports import import_products
+
+
+class Command(BaseCommand):
+    help = (
+        'Add and update products from a CSV sheet (id, name, description, price, stock). '
+        'The sheet is loaded into a staging table with COPY, checked with the product form '
+        'rules and applied with one MERGE. Without --apply only the changes are shown.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--apply', action='store_true', help='Save the changes (default: dry run)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('import_products loads the sheet with COPY and needs PostgreSQL.')
+        try:
+            data = Path(options['path']).read_bytes()
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["path"]}: {e}')
+        try:
+            result = import_products(data, apply=options['apply'])
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        for change in result['changes']:
+            if change['action'] == 'insert':
+                self.stdout.write(
+                    f"  line {change['line']}: new {change['name']} price {change['price']} stock {change['stock']}"
+                )
+            else:
+                self.stdout.write(
+                    f"  line {change['line']}: #{change['product_id']} {change['name']} "
+                    f"price {change['old_price']} -> {change['price']} stock {change['old_stock']} -> {change['stock']}"
+                )
+        for error in result['errors']:
+            self.stdout.write(self.style.ERROR(f"  line {error['line']}: {error['product'] or '-'}: {error['error']}"))
+
+        counts = result['counts']
+        summary = (
+            f"{counts['insert']:,} new, {counts['update']:,} updated, {counts['unchanged']:,} unchanged, "
+            f"{counts['error']:,} errors in {result['seconds']:.2f}s."
+        )
+        if counts['error']:
+            raise CommandError(f'Nothing imported: {summary}')
+        if result['applied']:
+            self.stdout.write(self.style.SUCCESS(f'Imported: {summary}'))
+        else:
+            self.stdout.write(f'Dry run: {summary} Run again with --apply to save.')
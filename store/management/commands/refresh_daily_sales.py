@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from store.models import Order
+from store.reports import refresh_daily_sales
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollup used by the dashboard (closed days only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Refresh the last N closed days (default: 2)',
+        )
+        parser.add_argument(
+            '--since',
+            help='Refresh every day from this date (YYYY-MM-DD) up to yesterday',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Refresh every day since the first order',
+        )
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+
+        if options['all']:
+            first_order = Order.objects.aggregate(first=Min('created_at'))['first']
+            if first_order is None:
+                self.stdout.write('No orders yet, nothing to refresh.')
+                return
+            first_day = timezone.localdate(first_order)
+        elif options['since']:
+            try:
+                first_day = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--since must be a date in the form YYYY-MM-DD.')
+        else:
+            first_day = yesterday - timedelta(days=max(options['days'], 1) - 1)
+
+        # Refresh in yearly batches to keep each aggregate query bounded
+        days = [first_day + timedelta(days=n) for n in range((yesterday - first_day).days + 1)]
+        refreshed = 0
+        for index in range(0, len(days), 366):
+            refreshed += refresh_daily_sales(days[index:index + 366])
+
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} days.'))
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from store.seeding import StoreSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a deterministic, realistic store history (customers, feed products, '
+        'orders and order items) with PostgreSQL COPY. Existing data is kept. '
+        'About 3.7 million orders make 10 million order items at the default basket size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=2000, help='Customers to create (default: 2000)')
+        parser.add_argument('--products', type=int, default=96, help='Products to create (default: 96)')
+        parser.add_argument('--orders', type=int, default=50000, help='Orders to create (default: 50000)')
+        parser.add_argument(
+            '--items-per-order',
+            type=float,
+            default=2.7,
+            help='Average number of lines per order (default: 2.7)',
+        )
+        parser.add_argument('--days', type=int, default=730, help='Spread the orders over N days (default: 730)')
+        parser.add_argument('--end', help='Last day with orders, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20000,
+            help='Orders loaded and committed per COPY batch (default: 20000)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_store loads its data with COPY and needs PostgreSQL.')
+        if min(options['customers'], options['products'], options['days'], options['batch_size']) < 1:
+            raise CommandError('--customers, --products, --days and --batch-size must be at least 1.')
+        if options['orders'] < 0:
+            raise CommandError('--orders cannot be negative.')
+
+        end = None
+        if options['end']:
+            try:
+                end = datetime.strptime(options['end'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--end must be a date in the form YYYY-MM-DD.')
+            if end >= timezone.localdate():
+                raise CommandError('--end must be a day before today.')
+
+        seeder = StoreSeeder(
+            customers=options['customers'],
+            products=options['products'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            days=options['days'],
+            end=end,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=self.stdout.write,
+        )
+        self.stdout.write(
+            f'Seeding {seeder.start} to {seeder.end} (seed {options["seed"]})...'
+        )
+        result = seeder.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result["customers"]:,} customers, {result["products"]:,} products, '
+            f'{result["orders"]:,} orders and {result["items"]:,} order items in {result["seconds"]:.1f}s.'
+        ))
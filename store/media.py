@@ -0,0 +1,124 @@
+import mimetypes
+import os
+import re
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import is_immutable
+
+# Files named after their contents never change (see store.storage)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Anything else may be replaced under the same name: revalidate every time
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNK_SIZE = 64 * 1024
+
+
+def _etag(name, stat):
+    if is_immutable(default_storage, name):
+        # The hash in the name is the contents, whatever the copy on disk
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    return '"%x-%x"' % (stat.st_size, stat.st_mtime_ns)
+
+
+def _byte_range(header, size):
+    """(first, last) byte of a single ``Range`` header, None to send the
+    whole file (no range or several of them), or 'unsatisfiable'"""
+    match = _RANGE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # The last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return 'unsatisfiable'
+    return first, last
+
+
+def _read(path, first, length):
+    with open(path, 'rb') as file:
+        file.seek(first)
+        while length > 0:
+            chunk = file.read(min(_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """Serve an uploaded file from MEDIA_ROOT with caching headers.
+
+    Content-named files are cached by browsers for a year without
+    revalidating; others carry an ETag and Last-Modified for cheap 304s.
+    A single ``Range`` (resumed or partial downloads) is answered with 206.
+    """
+    try:
+        full_path = default_storage.path(path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = _etag(path, stat)
+    # Headers of every answer, 304s included
+    cache_headers = HttpResponse()
+    cache_headers['ETag'] = etag
+    cache_headers['Last-Modified'] = http_date(stat.st_mtime)
+    cache_headers['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if is_immutable(default_storage, path) else REVALIDATE_CACHE_CONTROL
+    )
+    cache_headers['Accept-Ranges'] = 'bytes'
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime), response=cache_headers,
+    )
+    if conditional is not cache_headers:
+        return conditional
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    byte_range = None
+    if 'HTTP_RANGE' in request.META:
+        if_range = request.META.get('HTTP_IF_RANGE')
+        # A range of an older copy than the client has is no use: send it all
+        if not if_range or if_range == etag:
+            byte_range = _byte_range(request.META['HTTP_RANGE'], stat.st_size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    if byte_range:
+        first, last = byte_range
+        length = last - first + 1
+        response = HttpResponse(status=206) if request.method == 'HEAD' else StreamingHttpResponse(
+            _read(full_path, first, length), status=206,
+        )
+        response['Content-Range'] = f'bytes {first}-{last}/{stat.st_size}'
+        response['Content-Length'] = length
+    elif request.method == 'HEAD':
+        response = HttpResponse()
+        response['Content-Length'] = stat.st_size
+    else:
+        response = FileResponse(open(full_path, 'rb'))
+
+    response['Content-Type'] = content_type
+    for header in ('ETag', 'Last-Modified', 'Cache-Control', 'Accept-Ranges'):
+        response[header] = cache_headers[header]
+    return response
@@ -0,0 +1,175 @@
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('store.metrics')
+
+_current = contextvars.ContextVar('store_request_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its budget in STORE_QUERY_BUDGETS"""
+
+
+class RequestMetrics:
+    """Query count and time split of one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+
+    @property
+    def python_time(self):
+        return max(self.total_time - self.db_time - self.template_time, 0.0)
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute_wrapper counting and timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        """Value of the Server-Timing response header"""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'app;dur={self.python_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'python_ms': round(self.python_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def current_metrics():
+    """The RequestMetrics of the request being handled, if any"""
+    return _current.get()
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """Counters of the connection pool of this worker process, None when
+    the database is not pooled (see DATABASES in the settings).
+
+    checked_out and waiting are the connections lent out and the requests
+    queued for one right now; created, wait_ms and timeouts count since the
+    worker started.
+    """
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    # Counters still at zero are left out
+    stats = pool.get_stats()
+    return {
+        'size': stats.get('pool_size', 0),
+        'checked_out': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+        'waiting': stats.get('requests_waiting', 0),
+        'created': stats.get('connections_num', 0),
+        'wait_ms': stats.get('requests_wait_ms', 0),
+        'timeouts': stats.get('requests_errors', 0),
+        'lost': stats.get('connections_lost', 0),
+    }
+
+
+class RequestMetricsMiddleware:
+    """Measure every request: query count, DB time, template time and the
+    Python time left over.
+
+    The numbers go out as a Server-Timing header (visible in the browser's
+    network panel) and as one JSON log line on the 'store.metrics' logger,
+    tagged with the resolved view name, with the worker's connection pool
+    counters. GET requests of the views listed
+    in STORE_QUERY_BUDGETS are checked against their query budget: going
+    over is logged as a warning, or raises QueryBudgetExceeded when
+    STORE_QUERY_BUDGETS_STRICT is on (see the check_query_budgets command).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics = metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            metrics.total_time = time.perf_counter() - started
+            _current.reset(token)
+
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        response['Server-Timing'] = metrics.server_timing()
+        logger.info(json.dumps({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **metrics.as_dict(),
+            'pool': pool_stats(),
+        }))
+        self.check_budget(request, view_name, metrics)
+        return response
+
+    def check_budget(self, request, view_name, metrics):
+        if request.method not in ('GET', 'HEAD'):
+            return
+        budget = settings.STORE_QUERY_BUDGETS.get(view_name)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = f'{view_name} ran {metrics.queries} queries, over its budget of {budget}'
+        if settings.STORE_QUERY_BUDGETS_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class _TimedTemplate:
+    """Template wrapper adding its render time (minus the queries it ran) to the request metrics"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return self.template.render(context, request)
+
+        db_time = metrics.db_time
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            elapsed = time.perf_counter() - started
+            # Lazy querysets evaluated while rendering count as DB time, not template time
+            metrics.template_time += max(elapsed - (metrics.db_time - db_time), 0.0)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times recorded for RequestMetricsMiddleware"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
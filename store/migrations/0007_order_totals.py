@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:05
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_order_totals(apps, schema_editor):
+    """Fill the stored totals of existing orders from their items"""
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    Order.objects.update(
+        total_amount=Coalesce(
+            Subquery(items.annotate(total=Sum(F('quantity') * F('price'))).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        item_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), Value(0)),
+    )
+    Order.objects.update(
+        remaining_amount=Greatest(F('total_amount') - F('paid_amount'), Value(Decimal('0.00')))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_delete_productentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد المنتجات'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='remaining_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12, verbose_name='المبلغ المتبقي'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12, verbose_name='الإجمالي'),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
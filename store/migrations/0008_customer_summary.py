@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:07
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_customer_summaries(apps, schema_editor):
+    """Fill the summary of existing customers from their stored order totals"""
+    Customer = apps.get_model('store', 'Customer')
+    Order = apps.get_model('store', 'Order')
+
+    orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+    money = DecimalField(max_digits=14, decimal_places=2)
+    Customer.objects.update(
+        total_debt=Coalesce(
+            Subquery(orders.annotate(debt=Sum('remaining_amount')).values('debt')),
+            Value(Decimal('0.00')),
+            output_field=money,
+        ),
+        order_count=Coalesce(Subquery(orders.annotate(count=Count('id')).values('count')), Value(0)),
+        last_order_at=Subquery(orders.annotate(latest=Max('created_at')).values('latest')),
+        lifetime_spend=Coalesce(
+            Subquery(orders.annotate(spend=Sum('total_amount')).values('spend')),
+            Value(Decimal('0.00')),
+            output_field=money,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='تاريخ آخر طلب'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='lifetime_spend',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14, verbose_name='إجمالي المشتريات'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الطلبات'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_debt',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14, verbose_name='إجمالي الديون'),
+        ),
+        migrations.RunPython(backfill_customer_summaries, migrations.RunPython.noop),
+    ]
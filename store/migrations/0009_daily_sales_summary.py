@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:08
+
+from datetime import datetime, time
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_sales(apps, schema_editor):
+    """Build the rollup rows of every closed day that already has orders"""
+    DailySalesSummary = apps.get_model('store', 'DailySalesSummary')
+    Order = apps.get_model('store', 'Order')
+
+    # Today stays out of the rollup, it is always aggregated live
+    today_start = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    rows = (
+        Order.objects.filter(created_at__lt=today_start)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('day')
+        .annotate(
+            order_count=Count('id'),
+            revenue=Sum('total_amount'),
+            paid=Sum('paid_amount'),
+            outstanding=Sum('remaining_amount'),
+            completed_count=Count('id', filter=Q(status='completed')),
+            cancelled_count=Count('id', filter=Q(status='cancelled')),
+        )
+    )
+    DailySalesSummary.objects.bulk_create(
+        [DailySalesSummary(date=row.pop('day'), **row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_customer_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='اليوم')),
+                ('order_count', models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='الإيرادات')),
+                ('paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='المدفوع')),
+                ('outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='المتبقي')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='مكتمل')),
+                ('cancelled_count', models.PositiveIntegerField(default=0, verbose_name='ملغي')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'ملخص مبيعات يومي',
+                'verbose_name_plural': 'ملخصات المبيعات اليومية',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
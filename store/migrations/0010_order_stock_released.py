@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_daily_sales_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_released',
+            field=models.BooleanField(default=False, editable=False, verbose_name='تمت إعادة المخزون'),
+        ),
+    ]
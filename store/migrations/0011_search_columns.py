@@ -0,0 +1,94 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:19
+
+import re
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# A copy of store.search's normalization as it was when the columns were
+# added, so later changes to it do not change this migration
+ARABIC_VARIANTS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ـ': None,  # tatweel
+    **{chr(code): None for code in range(0x064B, 0x0653)},  # harakat
+    'ٰ': None,  # superscript alef
+    **{chr(0x0660 + n): str(n) for n in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + n): str(n) for n in range(10)},  # Persian digits
+})
+WHITESPACE = re.compile(r'\s+')
+NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_arabic(text):
+    if not text:
+        return ''
+    text = text.translate(ARABIC_VARIANTS).casefold()
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def digits_only(text):
+    if not text:
+        return ''
+    return NON_DIGITS.sub('', text.translate(ARABIC_VARIANTS))
+
+
+def backfill_search_columns(apps, schema_editor):
+    """Fill the normalized search columns of existing customers and products"""
+    Customer = apps.get_model('store', 'Customer')
+    Product = apps.get_model('store', 'Product')
+
+    customers = list(Customer.objects.only('full_name', 'phone_number'))
+    for customer in customers:
+        customer.search_name = normalize_arabic(customer.full_name)
+        customer.search_phone = digits_only(customer.phone_number)
+    Customer.objects.bulk_update(customers, ['search_name', 'search_phone'], batch_size=1000)
+
+    products = list(Product.objects.only('name'))
+    for product in products:
+        product.search_name = normalize_arabic(product.name)
+    Product.objects.bulk_update(products, ['search_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_order_stock_released'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='customer',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_phone',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='customer_search_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_phone'], name='customer_search_phone_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='product_search_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
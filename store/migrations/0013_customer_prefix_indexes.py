@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:18
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.comparison.Collate('search_name', 'C'), name='customer_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.comparison.Collate('search_phone', 'C'), name='customer_phone_prefix_idx'),
+        ),
+    ]
@@ -1,25 +1,159 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
+from django.db.models import DEFERRED, Count, DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Collate, Greatest
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from . import images
+from .search import digits_only, normalize_arabic
+
+
+def _with_search_fields(update_fields, search_fields):
+    """update_fields plus the search columns derived from any field in it"""
+    update_fields = list(update_fields)
+    for field, search_field in search_fields.items():
+        if field in update_fields and search_field not in update_fields:
+            update_fields.append(search_field)
+    return update_fields
+
+
+class CustomerQuerySet(models.QuerySet):
+    def _order_summaries(self):
+        """Subqueries computing each customer's summary from the stored order totals"""
+        orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+        money = DecimalField(max_digits=14, decimal_places=2)
+        return {
+            'total_debt': Coalesce(
+                Subquery(orders.annotate(debt=Sum('remaining_amount')).values('debt')),
+                Value(Decimal('0.00')),
+                output_field=money,
+            ),
+            'order_count': Coalesce(Subquery(orders.annotate(count=Count('id')).values('count')), Value(0)),
+            'last_order_at': Subquery(orders.annotate(latest=Max('created_at')).values('latest')),
+            'lifetime_spend': Coalesce(
+                Subquery(orders.annotate(spend=Sum('total_amount')).values('spend')),
+                Value(Decimal('0.00')),
+                output_field=money,
+            ),
+        }
+
+    def with_calculated_summary(self):
+        """Annotate each customer with the summary computed from their orders"""
+        return self.annotate(**{
+            f'calculated_{name}': expression for name, expression in self._order_summaries().items()
+        })
+
+    def with_stale_summaries(self):
+        """Customers whose stored summary no longer matches their orders"""
+        same_last_order = (
+            Q(last_order_at=F('calculated_last_order_at'))
+            | Q(last_order_at__isnull=True, calculated_last_order_at__isnull=True)
+        )
+        return self.with_calculated_summary().exclude(
+            Q(
+                total_debt=F('calculated_total_debt'),
+                order_count=F('calculated_order_count'),
+                lifetime_spend=F('calculated_lifetime_spend'),
+            ) & same_last_order
+        )
+
+    def rebuild_summaries(self):
+        """Recalculate the stored summaries with one set-based UPDATE"""
+        return self.update(**self._order_summaries())
+
+    def shift_summary(self, orders=0, spend=Decimal('0.00'), debt=Decimal('0.00'), ordered_at=None):
+        """Apply order deltas to the stored summary in one UPDATE"""
+        changes = {}
+        if orders:
+            changes['order_count'] = F('order_count') + orders
+        if spend:
+            changes['lifetime_spend'] = F('lifetime_spend') + spend
+        if debt:
+            changes['total_debt'] = F('total_debt') + debt
+        if ordered_at is not None:
+            changes['last_order_at'] = Greatest(Coalesce('last_order_at', Value(ordered_at)), Value(ordered_at))
+        elif orders < 0:
+            changes['last_order_at'] = self._order_summaries()['last_order_at']
+        if not changes:
+            return 0
+        return self.update(**changes)
+
 
 class Customer(models.Model):
+    # Denormalized from the customer's orders, maintained by Order.save() and
+    # the Order post_delete signal. Never written back from a model instance.
+    SUMMARY_FIELDS = ('total_debt', 'order_count', 'last_order_at', 'lifetime_spend')
+
     full_name = models.CharField(max_length=200, unique=True, verbose_name='الاسم الكامل')
     phone_number = models.CharField(max_length=20, blank=True, null=True, verbose_name='رقم الهاتف')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإضافة')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
 
+    total_debt = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name='إجمالي الديون'
+    )
+    order_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الطلبات')
+    last_order_at = models.DateTimeField(blank=True, null=True, editable=False, verbose_name='تاريخ آخر طلب')
+    lifetime_spend = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name='إجمالي المشتريات'
+    )
+
+    # Normalized copies of full_name / phone_number for trigram search (see store.search)
+    search_name = models.CharField(max_length=200, default='', editable=False)
+    search_phone = models.CharField(max_length=20, default='', editable=False)
+
+    objects = CustomerQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'عميل'
         verbose_name_plural = 'العملاء'
         ordering = ['full_name']
+        indexes = [
+            GinIndex(fields=['search_name'], name='customer_search_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['search_phone'], name='customer_search_phone_trgm', opclasses=['gin_trgm_ops']),
+            # Keyset pages of customer_list sorted by date (full_name is unique, so already indexed)
+            models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+            # Prefix matches of the order form's customer search, in order (store.search.aautocomplete)
+            models.Index(Collate('search_name', 'C'), name='customer_name_prefix_idx'),
+            models.Index(Collate('search_phone', 'C'), name='customer_phone_prefix_idx'),
+        ]
 
     def __str__(self):
         return self.full_name
 
+    def save(self, *args, **kwargs):
+        """Save the customer without overwriting the summary with stale values"""
+        self.refresh_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and update_fields is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.SUMMARY_FIELDS
+            ]
+        elif update_fields is not None:
+            kwargs['update_fields'] = _with_search_fields(update_fields, {
+                'full_name': 'search_name',
+                'phone_number': 'search_phone',
+            })
+        super().save(*args, **kwargs)
+
+    def refresh_search_fields(self):
+        """Recompute the normalized search columns from the name and phone"""
+        self.search_name = normalize_arabic(self.full_name)
+        self.search_phone = digits_only(self.phone_number)
+
     def get_total_debt(self):
-        """Calculate total remaining money across all orders"""
-        return sum(order.get_remaining_amount() for order in self.orders.all())
+        """Total remaining money across all orders (stored, see Order.save)"""
+        return self.total_debt
 
 
 class Product(models.Model):
@@ -36,14 +170,82 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإضافة')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
 
+    # Normalized copy of name for trigram search (see store.search)
+    search_name = models.CharField(max_length=200, default='', editable=False)
+    # sha256 of the image, naming its thumbnails (see store.images); empty
+    # until they are made
+    image_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+
     class Meta:
         verbose_name = 'منتج'
         verbose_name_plural = 'المنتجات'
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_name'], name='product_search_name_trgm', opclasses=['gin_trgm_ops']),
+            # Keyset pages of product_list for each sort, and the stock filters
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['stock', 'id'], name='product_stock_idx'),
+            # Products offered on the order form (and the "in stock" filter), newest first
+            models.Index(fields=['created_at', 'id'], condition=Q(stock__gt=0), name='product_in_stock_idx'),
+            # Products sharing an image file or its thumbnails (see release_image)
+            models.Index(fields=['image'], name='product_image_idx'),
+            models.Index(fields=['image_hash'], name='product_image_hash_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        # The image the thumbnails were made of, to spot a new upload in save
+        product._thumbnailed_image = product.__dict__.get('image', DEFERRED)
+        return product
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_fields()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = _with_search_fields(kwargs['update_fields'], {'name': 'search_name'})
+        super().save(*args, **kwargs)
+        if self._image_changed(kwargs.get('update_fields')):
+            replaced = getattr(self, '_thumbnailed_image', None), self.image_hash
+            self.refresh_thumbnails()
+            transaction.on_commit(lambda: Product.release_image(*replaced))
+
+    def refresh_search_fields(self):
+        """Recompute the normalized search column from the name"""
+        self.search_name = normalize_arabic(self.name)
+
+    def _image_changed(self, update_fields):
+        thumbnailed = getattr(self, '_thumbnailed_image', None)
+        if thumbnailed is DEFERRED or (update_fields is not None and 'image' not in update_fields):
+            return False
+        return (self.image.name or '') != (thumbnailed or '')
+
+    def refresh_thumbnails(self):
+        """Make the thumbnails of the image and record its hash, or clear the
+        hash when the image was removed"""
+        self.image_hash = images.build_thumbnails(self.image) if self.image else ''
+        Product.objects.filter(pk=self.pk).update(image_hash=self.image_hash)
+        self._thumbnailed_image = self.image.name
+
+    @classmethod
+    def release_image(cls, name, image_hash):
+        """Delete the image file ``name`` and the thumbnails of ``image_hash``
+        once no product uses them.
+
+        Files are shared between products with the same photo (see
+        store.storage), so this counts the products still referring to
+        them rather than deleting along with one product.
+        """
+        storage = cls._meta.get_field('image').storage
+        if name and not cls.objects.filter(image=name).exists():
+            storage.delete(name)
+        if image_hash and not cls.objects.filter(image_hash=image_hash).exists():
+            images.delete_thumbnails(storage, image_hash)
+
     def has_stock(self, quantity):
         """Check if product has sufficient stock"""
         return self.stock >= quantity
@@ -61,6 +263,39 @@ class Product(models.Model):
         self.save(update_fields=['stock'])
 
 
+class OrderQuerySet(models.QuerySet):
+    def _item_totals(self):
+        """Subqueries computing each order's total and item count from its items"""
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        total = Coalesce(
+            Subquery(items.annotate(total=Sum(F('quantity') * F('price'))).values('total')),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        count = Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), Value(0))
+        return total, count
+
+    def with_calculated_totals(self):
+        """Annotate each order with the totals computed from its items"""
+        total, count = self._item_totals()
+        return self.annotate(calculated_total=total, calculated_item_count=count)
+
+    def with_stale_totals(self):
+        """Orders whose stored totals no longer match their items"""
+        return self.with_calculated_totals().exclude(
+            total_amount=F('calculated_total'),
+            item_count=F('calculated_item_count'),
+            remaining_amount=Greatest(F('calculated_total') - F('paid_amount'), Value(Decimal('0.00'))),
+        )
+
+    def rebuild_totals(self):
+        """Recalculate the stored totals with set-based UPDATE statements"""
+        total, count = self._item_totals()
+        updated = self.update(total_amount=total, item_count=count)
+        self.update(remaining_amount=Greatest(F('total_amount') - F('paid_amount'), Value(Decimal('0.00'))))
+        return updated
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('completed', 'مكتمل'),
@@ -71,6 +306,7 @@ class Order(models.Model):
         Customer,
         on_delete=models.PROTECT,
         related_name='orders',
+        db_index=False,  # covered by order_customer_created_idx
         verbose_name='العميل'
     )
     status = models.CharField(
@@ -90,22 +326,102 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
     notes = models.TextField(blank=True, verbose_name='ملاحظات')
 
+    # Denormalized from the order items, maintained by update_totals()
+    total_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name='الإجمالي'
+    )
+    remaining_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name='المبلغ المتبقي'
+    )
+    item_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد المنتجات')
+    # Set once the items went back to stock (cancelled order), see store.inventory
+    stock_released = models.BooleanField(default=False, editable=False, verbose_name='تمت إعادة المخزون')
+
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'طلب'
         verbose_name_plural = 'الطلبات'
         ordering = ['-created_at']
+        indexes = [
+            # Date ranges and keyset pages of the dashboard and order_list
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+            # A customer's order history and the last_order_at summary
+            models.Index(fields=['customer', 'created_at'], name='order_customer_created_idx'),
+        ]
 
     def __str__(self):
         return f'طلب #{self.id} - {self.customer.full_name}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_summary()
+        return instance
+
+    def _remember_summary(self):
+        """Remember the values last written to the customer summary"""
+        self._summary_snapshot = (
+            self.__dict__.get('customer_id'),
+            self.__dict__.get('total_amount', Decimal('0.00')),
+            self.__dict__.get('remaining_amount', Decimal('0.00')),
+        )
+
+    def save(self, *args, **kwargs):
+        """Keep remaining_amount and the customer summary in step on every save"""
+        self.remaining_amount = max(self.total_amount - self.paid_amount, Decimal('0.00'))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'paid_amount' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'remaining_amount'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_customer_summary()
+
+    def _update_customer_summary(self):
+        """Shift the customer summary by the difference to the last saved values"""
+        old_customer_id, old_total, old_remaining = getattr(
+            self, '_summary_snapshot', (None, Decimal('0.00'), Decimal('0.00'))
+        )
+        if old_customer_id != self.customer_id:
+            if old_customer_id is not None:
+                Customer.objects.filter(pk=old_customer_id).shift_summary(
+                    orders=-1, spend=-old_total, debt=-old_remaining
+                )
+            Customer.objects.filter(pk=self.customer_id).shift_summary(
+                orders=1, spend=self.total_amount, debt=self.remaining_amount, ordered_at=self.created_at
+            )
+        else:
+            Customer.objects.filter(pk=self.customer_id).shift_summary(
+                spend=self.total_amount - old_total, debt=self.remaining_amount - old_remaining
+            )
+        self._remember_summary()
+
+    def calculate_totals(self):
+        """Aggregate total price and item count from the order items"""
+        totals = self.items.aggregate(total=Sum(F('quantity') * F('price')), count=Count('id'))
+        return totals['total'] or Decimal('0.00'), totals['count']
+
+    def update_totals(self):
+        """Recalculate the stored totals after order items change"""
+        self.total_amount, self.item_count = self.calculate_totals()
+        self.save(update_fields=['total_amount', 'remaining_amount', 'item_count'])
+
     def get_total_price(self):
-        """Calculate total order price from items"""
-        return sum(item.get_total_price() for item in self.items.all())
+        """Total order price (stored, see update_totals)"""
+        return self.total_amount
 
     def get_remaining_amount(self):
-        """Calculate remaining unpaid amount"""
-        total = self.get_total_price()
-        return max(total - self.paid_amount, Decimal('0.00'))
+        """Remaining unpaid amount (stored, see update_totals)"""
+        return self.remaining_amount
 
     def is_fully_paid(self):
         """Check if order is fully paid"""
@@ -142,5 +458,51 @@ class OrderItem(models.Model):
     def __str__(self):
         return f'{self.quantity} x {self.product.name}'
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.order.update_totals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.order.update_totals()
+        return result
+
     def get_total_price(self):
         return self.quantity * self.price
+
+
+class DailySalesSummary(models.Model):
+    """One row of order statistics per day, refreshed by store.reports.refresh_daily_sales"""
+    date = models.DateField(unique=True, verbose_name='اليوم')
+    order_count = models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='الإيرادات'
+    )
+    paid = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='المدفوع'
+    )
+    outstanding = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='المتبقي'
+    )
+    completed_count = models.PositiveIntegerField(default=0, verbose_name='مكتمل')
+    cancelled_count = models.PositiveIntegerField(default=0, verbose_name='ملغي')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+
+    class Meta:
+        verbose_name = 'ملخص مبيعات يومي'
+        verbose_name_plural = 'ملخصات المبيعات اليومية'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f'{self.date}: {self.order_count} طلب'
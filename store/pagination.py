@@ -0,0 +1,171 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """Paginator for a queryset whose row count is already known.
+
+    Saves the extra COUNT(*) query when the count comes out of an
+    aggregate that has to run anyway (e.g. the dashboard statistics).
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        return self._known_count
+
+    async def aget_page(self, number):
+        """get_page() with the rows fetched through the async ORM API"""
+        page = self.get_page(number)
+        page.object_list = [row async for row in page.object_list]
+        return page
+
+
+def _resolve_field(model, path):
+    """The model field a (possibly related) ordering path such as
+    ``customer__full_name`` points to"""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, with cursors to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Cursor pagination on ``(ordering, id)``, where ordering is a field
+    path or an annotation of the queryset.
+
+    Each page is fetched with a ``WHERE (field, id) > (last value, last id)``
+    style filter and LIMIT per_page + 1, so deep pages cost the same as the
+    first one and no COUNT(*) is ever issued. The cursor is an opaque token
+    carrying the sort value and id of the row at the page edge.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.descending = ordering.startswith('-')
+        self.field_path = ordering.lstrip('-')
+        annotation = queryset.query.annotations.get(self.field_path)
+        if annotation is not None:
+            # Sorting on an annotation such as a search rank
+            self.field = annotation.output_field
+        else:
+            self.field = _resolve_field(queryset.model, self.field_path)
+        self.per_page = per_page
+
+    def _order_by(self, descending):
+        prefix = '-' if descending else ''
+        return [f'{prefix}{self.field_path}', f'{prefix}id']
+
+    def _after(self, value, pk, descending):
+        """Rows that come after (value, pk) in the given direction.
+
+        The leading ``field >= value`` is redundant but gives PostgreSQL an
+        index condition on the (field, id) indexes, so deep pages start
+        reading at the cursor instead of filtering from the first row.
+        """
+        lookup = 'lt' if descending else 'gt'
+        return Q(**{f'{self.field_path}__{lookup}e': value}) & (
+            Q(**{f'{self.field_path}__{lookup}': value})
+            | Q(**{f'id__{lookup}': pk})
+        )
+
+    def _row_value(self, obj):
+        for attr in self.field_path.split('__'):
+            obj = getattr(obj, attr)
+        return obj
+
+    def encode_cursor(self, obj, direction):
+        # str() of a float is its exact round-trip form; a sort value must be
+        # of the type the field reads back, e.g. no float4 (see store.search)
+        payload = json.dumps([direction, str(self._row_value(obj)), obj.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """(direction, value, pk) of a cursor, or None if it is not valid"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ('next', 'previous'):
+                return None
+            return direction, self.field.to_python(value), int(pk)
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _page_rows(self, cursor):
+        """(queryset of the page a cursor points to plus one row, the
+        direction); the first page for a missing or bad cursor"""
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self.queryset.order_by(*self._order_by(self.descending))[:self.per_page + 1], None
+
+        direction, value, pk = position
+        if direction == 'next':
+            queryset = self.queryset.filter(self._after(value, pk, self.descending))
+            return queryset.order_by(*self._order_by(self.descending))[:self.per_page + 1], direction
+
+        # Walk backwards from the cursor; _page puts the rows back in display order
+        queryset = self.queryset.filter(self._after(value, pk, not self.descending))
+        return queryset.order_by(*self._order_by(not self.descending))[:self.per_page + 1], direction
+
+    def _page(self, rows, direction):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction is None:
+            return KeysetPage(rows, next_cursor=self.encode_cursor(rows[-1], 'next') if has_more else None)
+        if direction == 'next':
+            return KeysetPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1], 'next') if has_more else None,
+                previous_cursor=self.encode_cursor(rows[0], 'previous') if rows else None,
+            )
+        rows = rows[::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows else None,
+            previous_cursor=self.encode_cursor(rows[0], 'previous') if has_more else None,
+        )
+
+    def get_page(self, cursor=None):
+        """The page a cursor points to; the first page for a missing or bad cursor"""
+        queryset, direction = self._page_rows(cursor)
+        return self._page(list(queryset), direction)
+
+    async def aget_page(self, cursor=None):
+        """get_page() with the rows fetched through the async ORM API"""
+        queryset, direction = self._page_rows(cursor)
+        return self._page([row async for row in queryset], direction)
@@ -0,0 +1,176 @@
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailySalesSummary, Order
+
+# Rollup column holding the order count of each status
+STATUS_COUNT_FIELDS = {status: f'{status}_count' for status, _ in Order.STATUS_CHOICES}
+
+_pending = threading.local()
+
+
+def day_start(day):
+    """Aware datetime of 00:00 on ``day``, for index-friendly created_at ranges"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def orders_between(orders, start=None, end=None):
+    """Filter ``orders`` to those created on the days start..end (inclusive)"""
+    if start is not None:
+        orders = orders.filter(created_at__gte=day_start(start))
+    if end is not None:
+        orders = orders.filter(created_at__lt=day_start(end + timedelta(days=1)))
+    return orders
+
+
+async def _order_aggregates(orders):
+    """Raw totals of ``orders`` in one aggregate query"""
+    aggregates = {
+        'total_orders': Count('id'),
+        'total_revenue': Coalesce(Sum('total_amount'), Value(Decimal('0.00'))),
+    }
+    for status in STATUS_COUNT_FIELDS:
+        aggregates[f'status_{status}'] = Count('id', filter=Q(status=status))
+    return await orders.order_by().aaggregate(**aggregates)
+
+
+async def _rollup_aggregates(summaries):
+    """The same totals as _order_aggregates, summed from DailySalesSummary rows"""
+    aggregates = {
+        'total_orders': Coalesce(Sum('order_count'), Value(0)),
+        'total_revenue': Coalesce(Sum('revenue'), Value(Decimal('0.00'))),
+    }
+    for status, field in STATUS_COUNT_FIELDS.items():
+        aggregates[f'status_{status}'] = Coalesce(Sum(field), Value(0))
+    return await summaries.aaggregate(**aggregates)
+
+
+def _statistics(row):
+    total_orders = row['total_orders']
+    total_revenue = row['total_revenue']
+    return {
+        'total_orders': total_orders,
+        'total_revenue': total_revenue,
+        'average_order': total_revenue / total_orders if total_orders > 0 else Decimal('0.00'),
+        'status_stats': {status: row[f'status_{status}'] for status in STATUS_COUNT_FIELDS},
+    }
+
+
+async def asales_statistics(start=None, end=None):
+    """Order count, revenue, average order value and status breakdown for
+    the days start..end (inclusive).
+
+    Closed days are summed from the DailySalesSummary rollup and only today
+    is aggregated live from the orders, so a year-long range costs a few
+    hundred rollup rows instead of a scan of the whole order history.
+    """
+    today = timezone.localdate()
+    # Writes the rollup rows of the days closed since the last call
+    await sync_to_async(close_daily_sales)()
+
+    summaries = DailySalesSummary.objects.filter(date__lt=today)
+    if start is not None:
+        summaries = summaries.filter(date__gte=start)
+    if end is not None:
+        summaries = summaries.filter(date__lte=end)
+    row = await _rollup_aggregates(summaries)
+
+    if (start is None or start <= today) and (end is None or end >= today):
+        live = await _order_aggregates(orders_between(Order.objects.all(), today, today))
+        row = {key: row[key] + live[key] for key in row}
+
+    return _statistics(row)
+
+
+def _days(first_day, last_day):
+    return [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+
+
+def refresh_daily_sales(days):
+    """Recompute the DailySalesSummary rows of the given days from the orders.
+
+    Only closed days (before today) are written, including days without
+    orders, so the latest row always marks how far the rollup is complete.
+    Today is never stored; asales_statistics() aggregates it live. Reads
+    and writes go to the primary: a row computed from a lagging replica
+    would never be recomputed.
+    """
+    today = timezone.localdate()
+    days = sorted({day for day in days if day < today})
+    if not days:
+        return 0
+
+    aggregates = {
+        'order_count': Count('id'),
+        'revenue': Coalesce(Sum('total_amount'), Value(Decimal('0.00'))),
+        'paid': Coalesce(Sum('paid_amount'), Value(Decimal('0.00'))),
+        'outstanding': Coalesce(Sum('remaining_amount'), Value(Decimal('0.00'))),
+    }
+    for status, field in STATUS_COUNT_FIELDS.items():
+        aggregates[field] = Count('id', filter=Q(status=status))
+    rows = {
+        row.pop('day'): row
+        for row in orders_between(Order.objects.using(DEFAULT_DB_ALIAS), days[0], days[-1])
+        .filter(created_at__date__in=days)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('day')
+        .annotate(**aggregates)
+    }
+
+    DailySalesSummary.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [DailySalesSummary(date=day, **rows.get(day, {})) for day in days],
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=[*aggregates, 'updated_at'],
+    )
+    return len(days)
+
+
+def close_daily_sales():
+    """Bring the rollup up to yesterday, starting after its latest row (as
+    stored on the primary, see refresh_daily_sales)"""
+    yesterday = timezone.localdate() - timedelta(days=1)
+
+    latest = DailySalesSummary.objects.using(DEFAULT_DB_ALIAS).aggregate(latest=Max('date'))['latest']
+    if latest is not None:
+        first_day = latest + timedelta(days=1)
+    else:
+        first_order = Order.objects.using(DEFAULT_DB_ALIAS).aggregate(first=Min('created_at'))['first']
+        if first_order is None:
+            return 0
+        first_day = timezone.localdate(first_order)
+
+    if first_day > yesterday:
+        return 0
+    return refresh_daily_sales(_days(first_day, yesterday))
+
+
+def _refresh_pending_days():
+    days, _pending.days = getattr(_pending, 'days', set()), set()
+    today = timezone.localdate()
+    past_days = {day for day in days if day < today}
+    if past_days:
+        # Close any gap first, so the latest row keeps marking a complete rollup
+        close_daily_sales()
+        refresh_daily_sales(past_days)
+
+
+def refresh_daily_sales_on_commit(day):
+    """Refresh the rollup row of ``day`` once the current transaction commits.
+
+    Days are collected per thread, so the many order saves of one
+    create_order transaction end up as a single refresh. Orders of today
+    cost nothing here, as today is not part of the rollup.
+    """
+    if not hasattr(_pending, 'days'):
+        _pending.days = set()
+    _pending.days.add(day)
+    transaction.on_commit(_refresh_pending_days)
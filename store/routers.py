@@ -0,0 +1,109 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_current = contextvars.ContextVar('store_replica_routing', default=None)
+
+
+class _Routing:
+    """Where the reads of one request go"""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """Send the reads of the read-only pages (STORE_REPLICA_VIEWS) to a read
+    replica (STORE_READ_REPLICAS); everything else uses the primary.
+
+    Writes and locked reads (select_for_update) always go to the primary, as
+    do reads inside a transaction on it and every read of a request after
+    it wrote. ReplicaRoutingMiddleware picks the replica of each request.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        if routing is None or routing.replica is None or routing.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # The replica cannot see what this transaction has not committed
+            return None
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _streamed(content, routing):
+    """``content`` iterated with the reads routed as in its request, for
+    streamed responses (CSV exports) that query after the view returned"""
+    iterator = iter(content)
+    while True:
+        token = _current.set(routing)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield chunk
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of GET requests to the views of STORE_REPLICA_VIEWS to
+    a random read replica, the same one for the whole request.
+
+    A request that writes sets a cookie keeping the client's reads on the
+    primary for STORE_REPLICA_STICKY_SECONDS, longer than a replica lags:
+    the clerk who just created an order sees it on the next page. Sits
+    above SessionMiddleware, so session saves count as writes too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = _Routing()
+        token = _current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if routing.wrote:
+            response.set_cookie(
+                settings.STORE_REPLICA_STICKY_COOKIE,
+                '1',
+                max_age=settings.STORE_REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        elif routing.replica is not None and response.streaming and not response.is_async:
+            response.streaming_content = _streamed(response.streaming_content, routing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _current.get()
+        if (
+            routing is not None
+            and settings.STORE_READ_REPLICAS
+            and request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.STORE_REPLICA_VIEWS
+            and settings.STORE_REPLICA_STICKY_COOKIE not in request.COOKIES
+        ):
+            routing.replica = random.choice(settings.STORE_READ_REPLICAS)
+        return None
@@ -0,0 +1,104 @@
+import re
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Cast, Collate, Greatest
+
+# Spelling variants clerks type interchangeably, folded to one letter
+_ARABIC_VARIANTS = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ـ': None,  # tatweel
+    **{chr(code): None for code in range(0x064B, 0x0653)},  # harakat
+    'ٰ': None,  # superscript alef
+    **{chr(0x0660 + n): str(n) for n in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + n): str(n) for n in range(10)},  # Persian digits
+})
+
+# Shorter queries have no trigram to look up, so only the prefix match runs
+MIN_FUZZY_LENGTH = 3
+
+_WHITESPACE = re.compile(r'\s+')
+_NON_DIGITS = re.compile(r'\D')
+_PHONE_QUERY = re.compile(r'[\d\s+()-]+')
+
+
+def normalize_arabic(text):
+    """Fold Arabic spelling variants, diacritics and case for searching"""
+    if not text:
+        return ''
+    text = text.translate(_ARABIC_VARIANTS).casefold()
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def digits_only(text):
+    """The ASCII digits of a phone number, whatever digits it was typed in"""
+    if not text:
+        return ''
+    return _NON_DIGITS.sub('', text.translate(_ARABIC_VARIANTS))
+
+
+def _is_phone_query(query):
+    return _PHONE_QUERY.fullmatch(query.translate(_ARABIC_VARIANTS)) is not None
+
+
+def search(queryset, query, name_field, phone_field=None):
+    """Filter ``queryset`` to rows matching ``query`` and annotate ``search_rank``.
+
+    The query is normalized like the stored search columns, so every
+    spelling variant matches. A row matches when the name contains the
+    query or is word-similar to it (typos), or, for a query of digits, when
+    the phone contains them; both use the pg_trgm GIN indexes on the search
+    columns. Phone matches rank first, then names by trigram word similarity.
+    """
+    name = normalize_arabic(query)
+    condition = Q(**{f'{name_field}__contains': name}) | Q(**{f'{name_field}__trigram_word_similar': name})
+    rank = TrigramWordSimilarity(name, name_field)
+
+    digits = digits_only(query)
+    # Only a query made of digits is a phone number; a name like "أحمد 2"
+    # would otherwise turn into a phone scan
+    if phone_field and digits and _is_phone_query(query):
+        phone_match = Q(**{f'{phone_field}__contains': digits})
+        condition |= phone_match
+        rank = Greatest(rank, Case(When(phone_match, then=Value(1.0)), default=Value(0.0)))
+
+    # word_similarity() is a float4, which keyset cursors cannot carry exactly:
+    # a rank read back as float8 no longer equals the tied rows' own rank
+    return queryset.filter(condition).annotate(search_rank=Cast(rank, FloatField()))
+
+
+async def aautocomplete(queryset, query, name_field, phone_field, limit):
+    """Up to ``limit`` rows for a search-as-you-type box.
+
+    Rows whose name (or phone, for a query of digits) starts with the query
+    come first in alphabetical order, through the COLLATE "C" expression
+    indexes, which serve both the prefix LIKE and the order. The rest is
+    filled with the best search() matches, so typos and later words still
+    turn up.
+    """
+    name = normalize_arabic(query)
+    if not name:
+        return []
+    digits = digits_only(query)
+    if digits and _is_phone_query(query):
+        field, prefix = phone_field, digits
+    else:
+        field, prefix = name_field, name
+
+    rows = [
+        row async for row in queryset.annotate(prefix_key=Collate(field, 'C'))
+        .filter(prefix_key__startswith=prefix)
+        .order_by('prefix_key')[:limit]
+    ]
+    if len(rows) < limit and len(prefix) >= MIN_FUZZY_LENGTH:
+        rows += [
+            row async for row in search(
+                queryset.exclude(pk__in=[row.pk for row in rows]), query, name_field, phone_field
+            ).order_by('-search_rank', name_field)[:limit - len(rows)]
+        ]
+    return rows
@@ -0,0 +1,391 @@
+import math
+import random
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from datetime import time as day_time
+from itertools import accumulate
+
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .caching import CUSTOMER_PICKER, PRODUCT_CATALOG, invalidate
+from .models import Customer, Order, OrderItem, Product
+from .reports import refresh_daily_sales
+from .search import digits_only, normalize_arabic
+
+# (name, description, category, price of a 50 kg bag) of the feeds the store sells
+FEEDS = [
+    ('علف أبقار عالي البروتين', 'علف متكامل للأبقار الحلوب يحتوي على نسبة عالية من البروتين والفيتامينات لزيادة إنتاج الحليب.', 'ruminants', 450),
+    ('علف أغنام وماعز', 'خلطة علفية متوازنة للأغنام والماعز تساعد على النمو السريع وزيادة الوزن.', 'ruminants', 380),
+    ('علف دواجن تسمين', 'علف تسمين للدواجن (دجاج لحم) يساعد على النمو السريع وتحسين معدل التحويل الغذائي.', 'poultry', 320),
+    ('علف دجاج بياض', 'علف مخصص للدجاج البياض لزيادة إنتاج البيض، غني بالكالسيوم والبروتين.', 'poultry', 340),
+    ('علف خيول ومهور', 'علف متكامل للخيول والمهور يحتوي على الشعير والشوفان والفيتامينات.', 'other', 550),
+    ('علف أرانب', 'علف مخصص للأرانب بجميع أعمارها، غني بالألياف والبروتينات النباتية.', 'other', 280),
+    ('علف جمال (إبل)', 'خلطة علفية متكاملة للإبل تحتوي على الحبوب والأملاح المعدنية.', 'ruminants', 420),
+    ('علف عجول رضيعة', 'علف بادئ للعجول الرضيعة من عمر أسبوعين، سهل الهضم.', 'ruminants', 480),
+    ('علف مركز للماشية', 'علف مركز عالي القيمة الغذائية يخلط مع الأعلاف الخشنة.', 'ruminants', 520),
+    ('علف بط وإوز', 'علف مخصص للبط والإوز يساعد على النمو وزيادة الوزن.', 'poultry', 310),
+    ('علف حمام', 'خلطة من الحبوب المختارة للحمام: ذرة وقمح وعدس وبازلاء.', 'poultry', 220),
+    ('علف أسماك (زريعة)', 'علف طافي للأسماك الصغيرة، غني بالبروتين الحيواني والنباتي.', 'fish', 360),
+]
+BRANDS = ['النيل', 'الوادي', 'الدلتا', 'الريف', 'الصعيد', 'المراعي', 'الفرسان', 'الخير']
+# (label, price relative to a 50 kg bag)
+PACKS = [('50 كجم', 1.0), ('25 كجم', 0.53), ('10 كجم', 0.23)]
+
+# Monthly demand (January first) of each feed category: broilers in winter,
+# fish ponds in summer, livestock around the summer fattening season
+SEASONALITY = {
+    'poultry': [1.3, 1.25, 1.05, 0.9, 0.8, 0.7, 0.7, 0.75, 0.9, 1.1, 1.3, 1.4],
+    'ruminants': [1.05, 1.0, 0.9, 0.9, 1.0, 1.2, 1.3, 1.25, 1.05, 0.9, 0.95, 1.05],
+    'fish': [0.35, 0.45, 0.8, 1.1, 1.4, 1.55, 1.6, 1.5, 1.3, 1.0, 0.6, 0.4],
+    'other': [1.0] * 12,
+}
+# Orders per weekday (Monday first); the store is nearly closed on Fridays
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.05, 1.1, 0.3, 1.2, 1.1]
+
+MALE_NAMES = [
+    'محمد', 'أحمد', 'محمود', 'مصطفى', 'علي', 'حسن', 'حسين', 'إبراهيم', 'عبد الله', 'عبد الرحمن',
+    'عمر', 'خالد', 'يوسف', 'سيد', 'سعيد', 'عادل', 'طارق', 'كريم', 'هاني', 'وليد',
+    'ياسر', 'أشرف', 'جمال', 'رضا', 'صلاح', 'فتحي', 'عاطف', 'شريف', 'سامي', 'ماهر',
+    'نبيل', 'مجدي', 'رمضان', 'شعبان', 'عصام', 'منصور', 'جابر', 'صابر', 'فاروق', 'عبد العزيز',
+    'عبد الحميد', 'إسماعيل', 'زكريا', 'حمدي', 'رجب', 'عوض', 'فوزي', 'ناصر', 'سمير', 'حسام',
+    'عماد', 'أيمن', 'تامر', 'مدحت', 'ممدوح', 'بكر', 'عثمان', 'صبري', 'عبد الفتاح', 'متولي',
+]
+FEMALE_NAMES = [
+    'فاطمة', 'زينب', 'عائشة', 'مريم', 'سعاد', 'نجلاء', 'هدى', 'أمل', 'منى', 'سامية',
+    'نادية', 'حنان', 'إيمان', 'رحاب', 'صفاء',
+]
+FAMILY_NAMES = [
+    'المصري', 'الشافعي', 'النجار', 'الحداد', 'العطار', 'الفلاح', 'عبد الرحيم', 'السيوطي', 'المنياوي', 'الدمياطي',
+    'الشرقاوي', 'البحيري', 'الصعيدي', 'الفيومي', 'القناوي', 'الأسيوطي', 'سليمان', 'عبد الحليم', 'الجمال', 'البنا',
+    'الخولي', 'الزيات', 'السقا', 'الطحان', 'الفخراني', 'القاضي', 'المغربي', 'الحلواني', 'الجزار', 'أبو زيد',
+    'أبو العلا', 'أبو النجا', 'عبد الجواد', 'حجازي', 'شاهين', 'بدوي', 'عيسى', 'موسى', 'غانم', 'سالم',
+    'الشناوي', 'الدسوقي', 'الطنطاوي', 'المنوفي', 'عبد الغني', 'عبد الباقي', 'رزق', 'مرسي', 'عرفة', 'هلال',
+]
+ORDER_NOTES = ['توصيل للمزرعة', 'يدفع الباقي آخر الشهر', 'تحميل على عربة العميل', 'اتصل قبل التوصيل']
+
+# Bags per order line and how often each is ordered
+QUANTITIES = [1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50]
+QUANTITY_WEIGHTS = [22, 20, 13, 10, 9, 5, 5, 6, 4, 3, 2, 1]
+
+CANCELLED_SHARE = 0.04
+FULLY_PAID_SHARE = 0.60
+PARTLY_PAID_SHARE = 0.25  # the remaining 15% is on credit
+YEARLY_PRICE_INCREASE = 0.25
+
+
+def _copy_text(value):
+    """``value`` escaped for the COPY text format, NULL for None"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _money(cents):
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def copy_rows(cursor, model, columns, rows):
+    """Load ``rows`` (sequences of already formatted values) into the table of ``model`` with COPY"""
+    with cursor.copy(f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN') as copy:
+        for row in rows:
+            copy.write('\t'.join(row))
+            copy.write('\n')
+
+
+def reserve_ids(cursor, model, count):
+    """Take ``count`` ids from the primary key sequence of ``model``"""
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+        [model._meta.db_table, count],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+class StoreSeeder:
+    """Generate a realistic store history and load it with COPY.
+
+    Everything is drawn from one seeded random generator, so the same
+    options always produce the same customers, products and orders (only
+    the ids depend on the sequences). Orders are generated day by day in
+    chronological order:
+
+    * the order count of a day follows the season of the feeds, the weekday
+      and a steady growth of the business;
+    * customers join over the whole period and order with Pareto distributed
+      frequencies, so a few farms account for most of the sales;
+    * products are picked by popularity and by the season of their category,
+      and their prices rise every month;
+    * 4% of the orders are cancelled (with their stock released), the rest
+      is paid in full, in part or left on credit.
+
+    Each batch of orders is committed with its items; the customer
+    summaries and the daily sales rollup are rebuilt at the end. Inside
+    an outer transaction.atomic() (the throwaway datasets of
+    check_query_plans, check_query_budgets and bench_views) the batches
+    become savepoints and the tables are analyzed without VACUUM.
+    """
+
+    def __init__(self, customers, products, orders, items_per_order=2.7, days=730, end=None,
+                 seed=42, batch_size=20000, progress=None):
+        self.customers = customers
+        self.products = products
+        self.orders = orders
+        self.items_per_order = items_per_order
+        self.days = days
+        self.end = end or timezone.localdate() - timedelta(days=1)
+        self.start = self.end - timedelta(days=days - 1)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.rng = random.Random(seed)
+        self._price_cache = {}
+
+    def run(self):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            self.seed_products(cursor)
+            self.seed_customers(cursor)
+            items = self.seed_orders(cursor)
+        self.finish()
+        return {
+            'products': self.products,
+            'customers': self.customers,
+            'orders': self.orders,
+            'items': items,
+            'seconds': time.perf_counter() - started,
+        }
+
+    def _at(self, day, seconds):
+        return timezone.make_aware(datetime.combine(day, day_time.min)) + timedelta(seconds=seconds)
+
+    def seed_products(self, cursor):
+        rng = self.rng
+        self.product_ids = reserve_ids(cursor, Product, self.products)
+        self.product_categories = []
+        self.product_prices = []
+        rows = []
+        for n, product_id in enumerate(self.product_ids):
+            name, description, category, price = FEEDS[n % len(FEEDS)]
+            brand = BRANDS[n // len(FEEDS) % len(BRANDS)]
+            pack, pack_factor = PACKS[n // (len(FEEDS) * len(BRANDS)) % len(PACKS)]
+            full_name = f'{name} - {brand} {pack}'
+            if n >= len(FEEDS) * len(BRANDS) * len(PACKS):
+                full_name += f' ({n // (len(FEEDS) * len(BRANDS) * len(PACKS)) + 1})'
+            price_cents = round(price * pack_factor * rng.uniform(0.9, 1.15)) * 100
+            stock = rng.choices([0, rng.randint(1, 9), rng.randint(10, 500)], [10, 15, 75])[0]
+            created_at = self._at(self.start, 0) - timedelta(days=rng.randint(1, 60), seconds=rng.randint(0, 86399))
+            self.product_categories.append(category)
+            self.product_prices.append(price_cents)
+            rows.append((
+                str(product_id), _copy_text(full_name), _copy_text(description), '\\N', _money(price_cents),
+                str(stock), created_at.isoformat(), created_at.isoformat(), _copy_text(normalize_arabic(full_name)), '',
+            ))
+
+        # Popularity falls off with rank, whatever the position in the catalog
+        popularity = [1 / (rank + 1) ** 0.8 for rank in range(self.products)]
+        rng.shuffle(popularity)
+        self.product_weights = []
+        for month in range(12):
+            total, cumulative = 0.0, []
+            for weight, category in zip(popularity, self.product_categories):
+                total += weight * SEASONALITY[category][month]
+                cumulative.append(total)
+            self.product_weights.append(cumulative)
+
+        with transaction.atomic():
+            copy_rows(cursor, Product, [
+                'id', 'name', 'description', 'image', 'price', 'stock', 'created_at', 'updated_at', 'search_name',
+                'image_hash',
+            ], rows)
+        self.progress(f'Products: {self.products:,}')
+
+    def _customer_name(self, taken):
+        rng = self.rng
+        first = rng.choice(FEMALE_NAMES) if rng.random() < 0.1 else rng.choice(MALE_NAMES)
+        father, family = rng.choice(MALE_NAMES), rng.choice(FAMILY_NAMES)
+        for name in (f'{first} {father} {family}', f'{first} {father} {rng.choice(MALE_NAMES)} {family}'):
+            if name not in taken:
+                return name
+        suffix = 2
+        while f'{name} {suffix}' in taken:
+            suffix += 1
+        return f'{name} {suffix}'
+
+    def seed_customers(self, cursor):
+        rng = self.rng
+        taken = set(Customer.objects.values_list('full_name', flat=True))
+
+        # A third of the customers were already buying when the period starts
+        join_days = sorted(
+            0 if rng.random() < 0.3 else rng.randrange(self.days) for _ in range(self.customers)
+        )
+        self.customer_ids = reserve_ids(cursor, Customer, self.customers)
+        self.customer_weights = []
+        self.joined_by_day = [bisect_right(join_days, day) for day in range(self.days)]
+        rows = []
+        total_weight = 0.0
+        for customer_id, join_day in zip(self.customer_ids, join_days):
+            name = self._customer_name(taken)
+            taken.add(name)
+            phone = None if rng.random() < 0.1 else f'01{rng.choice("0125")}{rng.randint(0, 99999999):08d}'
+            if join_day == 0:
+                created_at = self._at(self.start, 0) - timedelta(days=rng.randint(1, 365), seconds=rng.randint(0, 86399))
+            else:
+                created_at = self._at(self.start + timedelta(days=join_day), rng.randint(6 * 3600, 8 * 3600 - 1))
+            total_weight += min(rng.paretovariate(1.2), 200)
+            self.customer_weights.append(total_weight)
+            rows.append((
+                str(customer_id), _copy_text(name), _copy_text(phone), created_at.isoformat(), created_at.isoformat(),
+                '0.00', '0', '\\N', '0.00', _copy_text(normalize_arabic(name)), _copy_text(digits_only(phone)),
+            ))
+
+        with transaction.atomic():
+            copy_rows(cursor, Customer, [
+                'id', 'full_name', 'phone_number', 'created_at', 'updated_at', 'total_debt', 'order_count',
+                'last_order_at', 'lifetime_spend', 'search_name', 'search_phone',
+            ], rows)
+        self.progress(f'Customers: {self.customers:,}')
+
+    def _orders_per_day(self):
+        rng = self.rng
+        mix = {category: self.product_categories.count(category) for category in SEASONALITY}
+        total, cumulative = 0.0, []
+        for n in range(self.days):
+            day = self.start + timedelta(days=n)
+            season = sum(SEASONALITY[category][day.month - 1] * count for category, count in mix.items())
+            growth = 0.6 + 0.8 * n / max(self.days - 1, 1)
+            # Nobody can order before the first customer joined
+            total += season * WEEKDAY_WEIGHTS[day.weekday()] * growth * bool(self.joined_by_day[n])
+            cumulative.append(total)
+
+        counts = [0] * self.days
+        for start in range(0, self.orders, 100000):
+            for n in rng.choices(range(self.days), cum_weights=cumulative, k=min(100000, self.orders - start)):
+                counts[n] += 1
+        return counts
+
+    def _basket_size(self):
+        if self.items_per_order <= 1:
+            return 1
+        # Geometric number of lines with the requested mean
+        size = 1 + int(math.log(1 - self.rng.random()) / math.log(1 - 1 / self.items_per_order))
+        return min(size, 12, self.products)
+
+    def _prices(self, day):
+        """Product prices in cents on ``day``, one step lower for every month before the end"""
+        months_before_end = (self.end.year - day.year) * 12 + self.end.month - day.month
+        if months_before_end not in self._price_cache:
+            factor = (1 + YEARLY_PRICE_INCREASE) ** (-months_before_end / 12)
+            self._price_cache[months_before_end] = [round(cents * factor / 100) * 100 for cents in self.product_prices]
+        return self._price_cache[months_before_end]
+
+    def _orders(self):
+        """Yield (order row, item rows) in chronological order"""
+        rng = self.rng
+        quantity_weights = list(accumulate(QUANTITY_WEIGHTS))
+        business_hours = 8 * 3600, 20 * 3600, 11 * 3600  # open 8:00-20:00, busiest around 11:00
+        for n, count in enumerate(self._orders_per_day()):
+            if not count:
+                continue
+            day = self.start + timedelta(days=n)
+            prices = self._prices(day)
+            product_weights = self.product_weights[day.month - 1]
+            customer_weights = self.customer_weights
+            joined = self.joined_by_day[n]
+            opening = self._at(day, 0)
+            for seconds in sorted(int(rng.triangular(*business_hours)) for _ in range(count)):
+                created_at = (opening + timedelta(seconds=seconds)).isoformat()
+                customer = bisect_right(customer_weights, rng.random() * customer_weights[joined - 1], 0, joined - 1)
+
+                size = self._basket_size()
+                picked = set()
+                for _ in range(size * 4):
+                    picked.add(bisect_right(product_weights, rng.random() * product_weights[-1], 0, self.products - 1))
+                    if len(picked) == size:
+                        break
+                items, total = [], 0
+                for product in sorted(picked):
+                    quantity = QUANTITIES[bisect_right(quantity_weights, rng.random() * quantity_weights[-1])]
+                    total += quantity * prices[product]
+                    items.append((product, quantity, prices[product]))
+
+                outcome = rng.random()
+                if outcome < CANCELLED_SHARE:
+                    status, paid = 'cancelled', 0
+                elif outcome < CANCELLED_SHARE + (1 - CANCELLED_SHARE) * FULLY_PAID_SHARE:
+                    status, paid = 'completed', total
+                elif outcome < CANCELLED_SHARE + (1 - CANCELLED_SHARE) * (FULLY_PAID_SHARE + PARTLY_PAID_SHARE):
+                    # Part payments are round amounts of 50
+                    status, paid = 'completed', int(total * rng.uniform(0.2, 0.9)) // 5000 * 5000
+                else:
+                    status, paid = 'completed', 0
+                notes = rng.choice(ORDER_NOTES) if rng.random() < 0.05 else ''
+
+                yield (
+                    self.customer_ids[customer], status, _money(paid), created_at, created_at, _copy_text(notes),
+                    _money(total), _money(total - paid), str(len(items)), 't' if status == 'cancelled' else 'f',
+                ), items
+
+    def seed_orders(self, cursor):
+        items_loaded = orders_loaded = 0
+        started = time.perf_counter()
+        generated = self._orders()
+        while orders_loaded < self.orders:
+            batch = [next(generated) for _ in range(min(self.batch_size, self.orders - orders_loaded))]
+            order_rows, item_rows = [], []
+            for order_id, (order, items) in zip(reserve_ids(cursor, Order, len(batch)), batch):
+                order_rows.append((str(order_id), str(order[0]), *order[1:]))
+                item_rows.extend(
+                    (str(order_id), str(self.product_ids[product]), str(quantity), _money(price))
+                    for product, quantity, price in items
+                )
+            with transaction.atomic():
+                copy_rows(cursor, Order, [
+                    'id', 'customer_id', 'status', 'paid_amount', 'created_at', 'updated_at', 'notes',
+                    'total_amount', 'remaining_amount', 'item_count', 'stock_released',
+                ], order_rows)
+                copy_rows(cursor, OrderItem, ['order_id', 'product_id', 'quantity', 'price'], item_rows)
+
+            orders_loaded += len(order_rows)
+            items_loaded += len(item_rows)
+            elapsed = time.perf_counter() - started
+            self.progress(
+                f'Orders: {orders_loaded:,}/{self.orders:,}, items: {items_loaded:,} '
+                f'({items_loaded / elapsed:,.0f} items/s)'
+            )
+        return items_loaded
+
+    def finish(self):
+        # COPY skips the signals that keep the order form's lists current
+        invalidate(PRODUCT_CATALOG)
+        invalidate(CUSTOMER_PICKER)
+
+        self.progress('Rebuilding customer summaries...')
+        Customer.objects.filter(pk__range=(min(self.customer_ids), max(self.customer_ids))).rebuild_summaries()
+
+        # Rebuild the whole rollup, so it has no gap before the seeded days
+        self.progress('Refreshing the daily sales rollup...')
+        first_day = min(timezone.localdate(Order.objects.aggregate(first=Min('created_at'))['first']), self.start)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        days = [first_day + timedelta(days=n) for n in range((yesterday - first_day).days + 1)]
+        for index in range(0, len(days), 366):
+            refresh_daily_sales(days[index:index + 366])
+
+        self.progress('Analyzing...')
+        tables = [model._meta.db_table for model in (Customer, Product, Order, OrderItem)]
+        with connection.cursor() as cursor:
+            if not connection.in_atomic_block:
+                for table in tables:
+                    cursor.execute(f'VACUUM ANALYZE {table}')
+                return
+            # VACUUM cannot run in a transaction: move the new trigram entries
+            # out of the GIN pending lists as it would, then analyze
+            cursor.execute(
+                'SELECT gin_clean_pending_list(i.indexrelid) FROM pg_index i '
+                'JOIN pg_class c ON c.oid = i.indexrelid JOIN pg_am am ON am.oid = c.relam '
+                'WHERE am.amname = %s AND i.indrelid::regclass::text = ANY(%s)',
+                ['gin', tables],
+            )
+            cursor.execute(f'ANALYZE {", ".join(tables)}')
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import CUSTOMER_PICKER, PRODUCT_CATALOG, invalidate
+from .models import Customer, Order, Product
+from .reports import refresh_daily_sales_on_commit
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_customer_summary(sender, instance, **kwargs):
+    """Take a deleted order out of its customer's summary.
+
+    Handled as a signal rather than in Order.delete() so that queryset
+    deletes (e.g. the admin's delete action) are covered as well.
+    """
+    Customer.objects.filter(pk=instance.customer_id).shift_summary(
+        orders=-1, spend=-instance.total_amount, debt=-instance.remaining_amount
+    )
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def refresh_order_day(sender, instance, **kwargs):
+    """Refresh the daily sales rollup of the day the order belongs to"""
+    refresh_daily_sales_on_commit(timezone.localdate(instance.created_at))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_catalog(sender, instance, **kwargs):
+    invalidate(PRODUCT_CATALOG)
+
+
+@receiver(post_delete, sender=Product)
+def release_product_image(sender, instance, **kwargs):
+    """Delete the image of a deleted product unless another product uses it"""
+    if instance.image:
+        transaction.on_commit(lambda: Product.release_image(instance.image.name, instance.image_hash))
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_customer_picker(sender, instance, **kwargs):
+    invalidate(CUSTOMER_PICKER)
@@ -0,0 +1,68 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+
+# <dir>/<hh>/<sha256>[-<variant>][.<ext>], the names ContentAddressedStorage
+# gives uploads and store.images gives their thumbnails
+_HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})(-[^/.]+)?(\.[^/.]+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names uploads after the sha256 of their
+    contents: ``products/photo.jpg`` is saved as ``products/<hh>/<sha256>.jpg``.
+
+    The same photo uploaded for a dozen products is stored once, and a name
+    never gets other contents, so it can be cached for good (see
+    store.media). Files are shared between the rows using them, so deleting
+    a row must not delete its file; Product.release_image deletes it once
+    no product refers to it any more.
+
+    Files under ``derived_dirs`` are already named after the file they were
+    made from (store.images thumbnails) and are kept under their own name.
+    """
+
+    def __init__(self, *args, derived_dirs=('thumbs/',), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.derived_dirs = tuple(derived_dirs)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if not name.startswith(self.derived_dirs):
+            name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Same name, same contents
+            return name
+        return super().save(name, content, max_length)
+
+    def hashed_name(self, name, content):
+        """``name`` with the file name replaced by the hash of ``content``"""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content_hash = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, content_hash[:2], content_hash + extension)
+
+
+def stored_hash(storage, name):
+    """The sha256 of the upload ``name`` read off its name, or None when the
+    storage did not name it after its contents"""
+    if not isinstance(storage, ContentAddressedStorage) or name.startswith(storage.derived_dirs):
+        return None
+    match = _HASHED_NAME.search(name)
+    if match is None or match.group(3):
+        return None
+    return match.group(2)
+
+
+def is_immutable(storage, name):
+    """Whether the file ``name`` is named after its contents (an upload or a
+    thumbnail) and so never changes"""
+    return isinstance(storage, ContentAddressedStorage) and _HASHED_NAME.search(name) is not None
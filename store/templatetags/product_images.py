@@ -0,0 +1,24 @@
+from django import template
+from django.urls import reverse
+
+from store.images import DEFAULT_WIDTH, THUMBNAIL_WIDTHS, thumbnail_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(product, width=DEFAULT_WIDTH, fmt='jpeg'):
+    """URL of a thumbnail of the product image (see store.images).
+
+    Before the thumbnails exist this is the product_thumbnail view, which
+    makes them on the first request.
+    """
+    if product.image_hash:
+        return product.image.storage.url(thumbnail_name(product.image_hash, width, fmt))
+    return reverse('store:product_thumbnail', args=[product.id, width, fmt])
+
+
+@register.simple_tag
+def thumbnail_srcset(product, fmt='webp'):
+    """srcset of the product image in every thumbnail width, for ``fmt``"""
+    return ', '.join(f'{thumbnail_url(product, width, fmt)} {width}w' for width in THUMBNAIL_WIDTHS)
@@ -1,3 +1,531 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .benchmarking import (
+    CHECKED_TABLES, FULL_SCANS_ALLOWED, ISOLATED_CACHES, logged_in_client, page_scenarios, plan_problems,
+)
+from .inventory import release_stock, reclaim_stock, reserve_stock, sync_order_stock
+from .models import Customer, DailySalesSummary, Order, OrderItem, Product
+from .pagination import KeysetPaginator
+from .reports import refresh_daily_sales
+from .search import search
+from .seeding import StoreSeeder
+
+
+class SearchRankPaginationTests(TestCase):
+    """Keyset pages over search() results whose ranks tie"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f'مركز تسمين {n:03d}', description='', price=Decimal('10.00'), stock=1)
+            for n in range(80)
+        ])
+        for product in Product.objects.all():
+            # search_name is filled in save()
+            product.save()
+
+    def walk(self, query, per_page):
+        paginator = KeysetPaginator(search(Product.objects.all(), query, 'search_name'), '-search_rank', per_page)
+        seen, cursor = [], None
+        for _ in range(20):
+            page = paginator.get_page(cursor)
+            seen += [product.pk for product in page]
+            if not page.has_next():
+                return seen
+            cursor = page.next_cursor
+        self.fail('next cursors never ran out')
+
+    def test_tied_ranks_page_through_every_match(self):
+        matches = search(Product.objects.all(), 'مركز تسمبن', 'search_name')
+        self.assertEqual(matches.values('search_rank').distinct().count(), 1)
+        seen = self.walk('مركز تسمبن', 15)
+        self.assertEqual(len(seen), 80)
+        self.assertEqual(len(set(seen)), 80)
+
+    def test_previous_cursor_returns_the_same_rows(self):
+        paginator = KeysetPaginator(search(Product.objects.all(), 'مركز تسمبن', 'search_name'), '-search_rank', 15)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual([product.pk for product in back], [product.pk for product in first])
+
+
+class OrderTotalsTests(TestCase):
+    """The totals stored on Order follow its items and payments"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(full_name='عميل الاختبار')
+        cls.feed = Product.objects.create(name='علف دواجن', description='', price=Decimal('320.00'), stock=100)
+        cls.bran = Product.objects.create(name='ردة', description='', price=Decimal('95.50'), stock=100)
+
+    def setUp(self):
+        self.order = Order.objects.create(customer=self.customer, paid_amount=Decimal('100.00'))
+
+    def assertTotals(self, total, count, remaining):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal(total))
+        self.assertEqual(self.order.item_count, count)
+        self.assertEqual(self.order.remaining_amount, Decimal(remaining))
+
+    def test_new_order_is_empty(self):
+        self.assertTotals('0.00', 0, '0.00')
+
+    def test_adding_items(self):
+        OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        self.assertTotals('640.00', 1, '540.00')
+        OrderItem.objects.create(order=self.order, product=self.bran, quantity=3, price=self.bran.price)
+        self.assertTotals('926.50', 2, '826.50')
+
+    def test_editing_an_item(self):
+        item = OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        item.quantity = 5
+        item.save()
+        self.assertTotals('1600.00', 1, '1500.00')
+        item.price = Decimal('300.00')
+        item.save()
+        self.assertTotals('1500.00', 1, '1400.00')
+
+    def test_deleting_an_item(self):
+        item = OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        OrderItem.objects.create(order=self.order, product=self.bran, quantity=1, price=self.bran.price)
+        item.delete()
+        self.assertTotals('95.50', 1, '0.00')
+
+    def test_changing_the_paid_amount(self):
+        OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        self.order.refresh_from_db()
+        self.order.paid_amount = Decimal('600.00')
+        self.order.save(update_fields=['paid_amount'])
+        self.assertTotals('640.00', 1, '40.00')
+        # Paying more than the total leaves nothing (not a negative amount) to pay
+        self.order.paid_amount = Decimal('700.00')
+        self.order.save()
+        self.assertTotals('640.00', 1, '0.00')
+
+    def test_stale_totals_are_found_and_rebuilt(self):
+        OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        self.assertFalse(Order.objects.with_stale_totals().exists())
+        # Queryset updates bypass Order.save(), as a raw SQL fix would
+        Order.objects.filter(pk=self.order.pk).update(total_amount=Decimal('1.00'), item_count=7)
+        self.assertEqual(list(Order.objects.with_stale_totals()), [self.order])
+
+        Order.objects.filter(pk=self.order.pk).rebuild_totals()
+        self.assertTotals('640.00', 1, '540.00')
+        self.assertFalse(Order.objects.with_stale_totals().exists())
+
+    def test_recalculate_totals_check(self):
+        OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        call_command('recalculate_totals', check=True, stdout=StringIO())
+
+        Order.objects.filter(pk=self.order.pk).update(total_amount=Decimal('1.00'))
+        with self.assertRaisesMessage(CommandError, '1 orders have stale totals'):
+            call_command('recalculate_totals', check=True, stdout=StringIO())
+
+        call_command('recalculate_totals', stdout=StringIO())
+        self.assertTotals('640.00', 1, '540.00')
+        call_command('recalculate_totals', check=True, stdout=StringIO())
+
+    def test_rebuilding_refreshes_the_daily_sales_rollup(self):
+        OrderItem.objects.create(order=self.order, product=self.feed, quantity=2, price=self.feed.price)
+        day = timezone.localdate() - timedelta(days=3)
+        Order.objects.filter(pk=self.order.pk).update(created_at=self.order.created_at - timedelta(days=3))
+        # A rollup computed while the total was wrong
+        Order.objects.filter(pk=self.order.pk).update(total_amount=Decimal('1.00'))
+        refresh_daily_sales([day])
+        self.assertEqual(DailySalesSummary.objects.get(date=day).revenue, Decimal('1.00'))
+
+        call_command('recalculate_totals', stdout=StringIO())
+        self.assertEqual(DailySalesSummary.objects.get(date=day).revenue, Decimal('640.00'))
+
+
+class CustomerSummaryTests(TestCase):
+    """The summary stored on Customer follows their orders"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='علف أغنام', description='', price=Decimal('50.00'), stock=100)
+
+    def setUp(self):
+        self.first = Customer.objects.create(full_name='العميل الأول')
+        self.second = Customer.objects.create(full_name='العميل الثاني')
+        self.order = self.place_order(self.first, quantity=4, paid='80.00')
+
+    def place_order(self, customer, quantity, paid='0.00'):
+        order = Order.objects.create(customer=customer, paid_amount=Decimal(paid))
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=self.product.price)
+        order.refresh_from_db()
+        return order
+
+    def assertSummaryCurrent(self, customer, orders, spend, debt):
+        """The stored summary of ``customer`` has these values and matches _order_summaries()"""
+        customer = Customer.objects.with_calculated_summary().get(pk=customer.pk)
+        self.assertEqual(
+            (customer.order_count, customer.lifetime_spend, customer.total_debt),
+            (orders, Decimal(spend), Decimal(debt)),
+        )
+        self.assertEqual(
+            (customer.order_count, customer.lifetime_spend, customer.total_debt, customer.last_order_at),
+            (
+                customer.calculated_order_count,
+                customer.calculated_lifetime_spend,
+                customer.calculated_total_debt,
+                customer.calculated_last_order_at,
+            ),
+        )
+
+    def test_placing_orders(self):
+        self.assertSummaryCurrent(self.first, 1, '200.00', '120.00')
+        self.place_order(self.first, quantity=1)
+        self.assertSummaryCurrent(self.first, 2, '250.00', '170.00')
+        self.assertSummaryCurrent(self.second, 0, '0.00', '0.00')
+
+    def test_reassigning_an_order(self):
+        self.place_order(self.first, quantity=1)
+        self.order.customer = self.second
+        self.order.save()
+        self.assertSummaryCurrent(self.first, 1, '50.00', '50.00')
+        self.assertSummaryCurrent(self.second, 1, '200.00', '120.00')
+        self.assertFalse(Customer.objects.with_stale_summaries().exists())
+
+    def test_deleting_an_order(self):
+        latest = self.place_order(self.first, quantity=1)
+        latest.delete()
+        self.assertSummaryCurrent(self.first, 1, '200.00', '120.00')
+        self.order.delete()
+        self.assertSummaryCurrent(self.first, 0, '0.00', '0.00')
+
+    def test_changing_the_paid_amount(self):
+        self.order.paid_amount = Decimal('200.00')
+        self.order.save(update_fields=['paid_amount'])
+        self.assertSummaryCurrent(self.first, 1, '200.00', '0.00')
+
+    def test_customer_save_keeps_the_summary(self):
+        stale = Customer.objects.get(pk=self.first.pk)
+        self.place_order(self.first, quantity=2)
+        # An instance loaded before the order must not write its old summary back
+        stale.phone_number = '01001234567'
+        stale.save()
+        self.assertSummaryCurrent(self.first, 2, '300.00', '220.00')
+        self.assertEqual(Customer.objects.get(pk=self.first.pk).search_phone, '01001234567')
+
+    def test_stale_summaries_are_rebuilt(self):
+        Customer.objects.filter(pk=self.first.pk).update(order_count=9, total_debt=Decimal('0.00'), last_order_at=None)
+        self.assertEqual(list(Customer.objects.with_stale_summaries()), [self.first])
+        Customer.objects.all().rebuild_summaries()
+        self.assertSummaryCurrent(self.first, 1, '200.00', '120.00')
+        self.assertFalse(Customer.objects.with_stale_summaries().exists())
+
+
+class StockReservationTests(TestCase):
+    """reserve_stock with the default locking strategy"""
+    strategy = 'locking'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(full_name='عميل المخزون')
+        cls.feed = Product.objects.create(name='علف أبقار', description='', price=Decimal('450.00'), stock=10)
+        cls.bran = Product.objects.create(name='نخالة', description='', price=Decimal('120.00'), stock=5)
+
+    def setUp(self):
+        self.order = Order.objects.create(customer=self.customer)
+
+    def reserve(self, quantities):
+        with transaction.atomic():
+            reserve_stock(self.order, quantities, strategy=self.strategy)
+
+    def assertStock(self, feed, bran):
+        self.assertEqual(
+            dict(Product.objects.filter(pk__in=[self.feed.pk, self.bran.pk]).values_list('pk', 'stock')),
+            {self.feed.pk: feed, self.bran.pk: bran},
+        )
+
+    def test_items_are_added_and_taken_from_stock(self):
+        self.reserve({self.feed.pk: 3, self.bran.pk: 5})
+        self.assertStock(7, 0)
+        self.assertEqual(
+            sorted(self.order.items.values_list('product', 'quantity', 'price')),
+            sorted([(self.feed.pk, 3, Decimal('450.00')), (self.bran.pk, 5, Decimal('120.00'))]),
+        )
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total_amount, self.order.item_count), (Decimal('1950.00'), 2))
+
+    def test_shortage_rolls_everything_back(self):
+        with self.assertRaisesMessage(ValidationError, 'المطلوب: 6، المتوفر: 5'):
+            self.reserve({self.feed.pk: 3, self.bran.pk: 6})
+        self.assertStock(10, 5)
+        self.assertFalse(self.order.items.exists())
+
+    def test_missing_product(self):
+        with self.assertRaisesMessage(ValidationError, 'غير موجود'):
+            self.reserve({self.feed.pk: 1, self.bran.pk + 1000: 1})
+        self.assertStock(10, 5)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            reserve_stock(self.order, {self.feed.pk: 1}, strategy='optimistic')
+
+
+class ConditionalStockReservationTests(StockReservationTests):
+    """reserve_stock with conditional UPDATEs instead of locks"""
+    strategy = 'conditional'
+
+    def test_shortage_reports_the_current_stock(self):
+        in_bulk = Product.objects.in_bulk
+
+        def read_then_sold_elsewhere(ids):
+            products = in_bulk(ids)
+            # Another order takes most of the bran between the read and the UPDATE
+            Product.objects.filter(pk=self.bran.pk).update(stock=2)
+            return products
+
+        with mock.patch.object(Product.objects, 'in_bulk', side_effect=read_then_sold_elsewhere):
+            with self.assertRaisesMessage(ValidationError, 'المطلوب: 4، المتوفر: 2'):
+                self.reserve({self.bran.pk: 4})
+
+
+class StockReleaseTests(TestCase):
+    """Putting the items of cancelled and deleted orders back in stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(full_name='عميل الإلغاء')
+        cls.feed = Product.objects.create(name='علف دجاج بياض', description='', price=Decimal('340.00'), stock=20)
+        cls.bran = Product.objects.create(name='ردة ناعمة', description='', price=Decimal('90.00'), stock=20)
+
+    def place_order(self, quantities):
+        with transaction.atomic():
+            order = Order.objects.create(customer=self.customer)
+            reserve_stock(order, quantities)
+        return order
+
+    def assertStock(self, feed, bran):
+        self.feed.refresh_from_db()
+        self.bran.refresh_from_db()
+        self.assertEqual((self.feed.stock, self.bran.stock), (feed, bran))
+
+    def test_release_groups_the_orders_per_product(self):
+        first = self.place_order({self.feed.pk: 3, self.bran.pk: 1})
+        second = self.place_order({self.feed.pk: 4})
+        self.assertStock(13, 19)
+        with transaction.atomic():
+            released = release_stock(Order.objects.filter(pk__in=[first.pk, second.pk]))
+        self.assertEqual(released, 2)
+        self.assertStock(20, 20)
+        self.assertEqual(Order.objects.filter(stock_released=True).count(), 2)
+
+    def test_release_twice_restores_once(self):
+        order = self.place_order({self.feed.pk: 3})
+        with transaction.atomic():
+            self.assertEqual(release_stock(Order.objects.filter(pk=order.pk)), 1)
+        with transaction.atomic():
+            self.assertEqual(release_stock(Order.objects.filter(pk=order.pk)), 0)
+        self.assertStock(20, 20)
+
+    def test_reclaim_takes_the_stock_again(self):
+        order = self.place_order({self.feed.pk: 3, self.bran.pk: 2})
+        with transaction.atomic():
+            release_stock(Order.objects.filter(pk=order.pk))
+            reclaim_stock(order)
+        self.assertStock(17, 18)
+        order.refresh_from_db()
+        self.assertFalse(order.stock_released)
+
+    def test_reclaim_shortage(self):
+        order = self.place_order({self.feed.pk: 3})
+        with transaction.atomic():
+            release_stock(Order.objects.filter(pk=order.pk))
+        Product.objects.filter(pk=self.feed.pk).update(stock=2)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            reclaim_stock(order)
+        self.assertStock(2, 20)
+        order.refresh_from_db()
+        self.assertTrue(order.stock_released)
+
+    def test_sync_follows_the_status(self):
+        order = self.place_order({self.feed.pk: 3})
+        for status, stock, released in [
+            ('cancelled', 20, True),
+            ('cancelled', 20, True),  # already released
+            ('completed', 17, False),
+            ('completed', 17, False),  # already taken
+        ]:
+            with self.subTest(status=status), transaction.atomic():
+                order.status = status
+                order.save()
+                sync_order_stock(order)
+                self.assertStock(stock, 20)
+                self.assertEqual(Order.objects.get(pk=order.pk).stock_released, released)
+
+    def test_reopening_takes_the_edited_quantities(self):
+        order = self.place_order({self.feed.pk: 3, self.bran.pk: 2})
+        with transaction.atomic():
+            order.status = 'cancelled'
+            order.save()
+            sync_order_stock(order)
+        # Lines edited while cancelled (e.g. in the admin) touch no stock...
+        item = order.items.get(product=self.feed)
+        item.quantity = 5
+        item.save()
+        order.items.get(product=self.bran).delete()
+        self.assertStock(20, 20)
+        # ...reopening takes out what the order holds now
+        with transaction.atomic():
+            order.status = 'completed'
+            order.save()
+            sync_order_stock(order)
+        self.assertStock(15, 20)
+
+
+@override_settings(CACHES=ISOLATED_CACHES)
+class EditOrderStockTests(TestCase):
+    """edit_order releases and reclaims the stock when the status changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='clerk@example.com', first_name='Clerk')
+        cls.customer = Customer.objects.create(full_name='عميل التعديل')
+        cls.feed = Product.objects.create(name='علف أرانب', description='', price=Decimal('280.00'), stock=10)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        with transaction.atomic():
+            self.order = Order.objects.create(customer=self.customer)
+            reserve_stock(self.order, {self.feed.pk: 4})
+
+    def edit(self, status):
+        response = self.client.post(reverse('store:edit_order', kwargs={'order_id': self.order.pk}), {
+            'customer': self.customer.pk, 'paid_amount': '0', 'notes': '', 'status': status,
+        })
+        self.assertRedirects(response, reverse('store:order_detail', kwargs={'order_id': self.order.pk}),
+                             fetch_redirect_response=False)
+        self.feed.refresh_from_db()
+        return self.feed.stock
+
+    def test_cancel_and_reopen(self):
+        self.assertEqual(self.edit('cancelled'), 10)
+        self.assertEqual(self.edit('cancelled'), 10)
+        self.assertEqual(self.edit('completed'), 6)
+
+
+@override_settings(
+    CACHES=ISOLATED_CACHES,
+    STORE_QUERY_BUDGETS_STRICT=True,
+    STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+)
+class QueryBudgetTests(TestCase):
+    """Every store page stays within its STORE_QUERY_BUDGETS (see check_query_budgets for a bigger dataset)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        StoreSeeder(customers=80, products=40, orders=600, days=90).run()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_stay_within_their_budgets(self):
+        client = logged_in_client()
+        for label, view_name, url in page_scenarios():
+            with self.subTest(label):
+                # Over budget raises QueryBudgetExceeded in strict mode
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(response.wsgi_request.metrics.queries, settings.STORE_QUERY_BUDGETS[view_name])
+
+
+@override_settings(
+    CACHES=ISOLATED_CACHES,
+    STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+)
+class QueryPlanTests(TestCase):
+    """An index serves every query of the store pages.
+
+    A test dataset is far too small for the planner to prefer an index, so
+    sequential scans are priced out: one left in a plan means no index fits
+    the query. check_query_plans checks the real plans on a big dataset.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        StoreSeeder(customers=80, products=40, orders=600, days=90).run()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_use_indexes(self):
+        client = logged_in_client()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for label, view_name, url in page_scenarios():
+            tables = CHECKED_TABLES - FULL_SCANS_ALLOWED.get(label, set())
+            with self.subTest(label):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(client.get(url).status_code, 200)
+                for query in queries.captured_queries:
+                    if not query['sql'].lstrip().upper().startswith('SELECT'):
+                        continue
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}")
+                        plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    self.assertEqual(plan_problems(plan[0]['Plan'], tables), [], query['sql'])
+
+
+@skipUnless(settings.STORE_READ_REPLICAS, 'set POSTGRES_REPLICAS (the primary itself will do) and DB_POOL=False')
+@override_settings(
+    CACHES=ISOLATED_CACHES,
+    STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+    STORE_READ_REPLICAS=settings.STORE_READ_REPLICAS[:1],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Read-only pages read from a replica until the client writes.
+
+    A TransactionTestCase, as reads inside a transaction on the primary
+    stay there; the replica is a test mirror of the primary.
+    """
+    databases = {DEFAULT_DB_ALIAS, *settings.STORE_READ_REPLICAS[:1]}
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user(email='clerk@example.com'))
+        Product.objects.create(name='علف حمام', description='', price=Decimal('220.00'), stock=5)
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections[settings.STORE_READ_REPLICAS[0]]) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_reads_follow_the_sticky_cookie(self):
+        products = reverse('store:product_list')
+        self.assertGreater(self.replica_queries(products), 0)
+
+        response = self.client.post(reverse('store:customer_create'), {'full_name': 'عميل جديد', 'phone_number': ''})
+        self.assertEqual(response.status_code, 302)
+        sticky = response.cookies[settings.STORE_REPLICA_STICKY_COOKIE]
+        self.assertEqual(sticky['max-age'], settings.STORE_REPLICA_STICKY_SECONDS)
+        # The client that just wrote reads its own changes from the primary...
+        self.assertEqual(self.replica_queries(products), 0)
+        self.assertEqual(self.replica_queries(reverse('store:customer_list')), 0)
+
+        # ...until the cookie expires
+        del self.client.cookies[settings.STORE_REPLICA_STICKY_COOKIE]
+        self.assertGreater(self.replica_queries(products), 0)
+
+    def test_other_pages_stay_on_the_primary(self):
+        self.assertEqual(self.replica_queries(reverse('store:create_order')), 0)
@@ -10,11 +10,14 @@ urlpatterns = [
     # Products
     path('products/', views.product_list, name='product_list'),
     path('products/add/', views.add_product, name='add_product'),
+    path('products/import/', views.import_products, name='import_products'),
     path('products/<int:product_id>/edit/', views.edit_product, name='edit_product'),
     path('products/<int:product_id>/delete/', views.delete_product, name='delete_product'),
+    path('products/<int:product_id>/thumbnail/<int:width>.<str:fmt>', views.product_thumbnail, name='product_thumbnail'),
 
     # Orders
     path('orders/', views.order_list, name='order_list'),
+    path('orders/export/', views.export_orders, name='export_orders'),
     path('orders/create/', views.create_order, name='create_order'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     path('orders/<int:order_id>/edit/', views.edit_order, name='edit_order'),
@@ -22,8 +25,11 @@ urlpatterns = [
 
     # Customers
     path('customers/', views.customer_list, name='customer_list'),
+    path('customers/export/', views.export_customers, name='export_customers'),
+    path('customers/autocomplete/', views.customer_autocomplete, name='customer_autocomplete'),
     path('customers/create/', views.customer_create, name='customer_create'),
     path('customers/<int:customer_id>/', views.customer_detail, name='customer_detail'),
+    path('customers/<int:customer_id>/statement/', views.customer_statement, name='customer_statement'),
     path('customers/<int:customer_id>/edit/', views.customer_edit, name='customer_edit'),
     path('customers/<int:customer_id>/delete/', views.customer_delete, name='customer_delete'),
 ]
@@ -1,98 +1,115 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.http import Http404, JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from datetime import datetime, timedelta
-from decimal import Decimal
-from .models import Product, Order, OrderItem, Customer
-from .forms import OrderForm, ProductForm, CustomerForm
+from .models import Product, Order, Customer
+from .caching import acustomer_suggestions, product_catalog
+from .exports import (
+    CUSTOMER_HEADER, ORDER_HEADER, STATEMENT_HEADER, csv_response, customer_rows, order_rows, statement_rows,
+)
+from .forms import OrderForm, ProductForm, CustomerForm, ProductImportForm
+from .images import THUMBNAIL_FORMATS, THUMBNAIL_WIDTHS, thumbnail_name
+from .imports import import_products as run_import, save_upload, upload_path
+from .inventory import release_stock, reserve_stock, sync_order_stock
+from .pagination import CountedPaginator, KeysetPaginator
+from .reports import asales_statistics, orders_between
+from .search import search
+
+DASHBOARD_PAGE_SIZE = 25
+LIST_PAGE_SIZE = 50
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 25
+
+# The read-only pages below are async views: their queries go through the
+# async ORM API, so under ASGI (see the README) a slow report does not hold
+# a worker while other requests wait
+
+
+async def _render(request, template_name, context):
+    """render() for the async views, off the event loop as templates may
+    still evaluate lazy objects"""
+    # The user login_required loaded, rather than a second query for the header
+    request.user = await request.auser()
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def _dashboard_range(params):
+    """(start, end, label) of the dashboard filter in ``params``, days being
+    None when open-ended; the label is None for an invalid custom range"""
+    filter_type = params.get('filter', 'all')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    today = timezone.localdate()
+
+    if filter_type == 'today':
+        return today, today, 'اليوم'
+    if filter_type == 'week':
+        return today - timedelta(days=today.weekday()), None, 'هذا الأسبوع'
+    if filter_type == 'month':
+        return today.replace(day=1), None, 'هذا الشهر'
+    if filter_type == 'custom' and start_date and end_date:
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return None, None, None
+        return start, end, f'من {start_date} إلى {end_date}'
+    return None, None, 'جميع الطلبات'
 
 
 @login_required
-def dashboard(request):
+async def dashboard(request):
     """Dashboard with order statistics and date filtering"""
-    # Get filter parameters
     filter_type = request.GET.get('filter', 'all')
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
+    start, end, filter_label = _dashboard_range(request.GET)
+    if filter_label is None:
+        filter_label = 'جميع الطلبات'
+        messages.error(request, 'تاريخ غير صحيح')
 
-    # Start with all orders
-    orders = Order.objects.all()
+    orders = orders_between(Order.objects.all(), start, end)
 
-    # Apply date filtering
-    today = datetime.now().date()
-    filter_label = 'جميع الطلبات'
+    # Statistics from the daily rollup plus today's live orders
+    stats = await asales_statistics(start, end)
 
-    if filter_type == 'today':
-        orders = orders.filter(created_at__date=today)
-        filter_label = 'اليوم'
-    elif filter_type == 'week':
-        week_start = today - timedelta(days=today.weekday())
-        orders = orders.filter(created_at__date__gte=week_start)
-        filter_label = 'هذا الأسبوع'
-    elif filter_type == 'month':
-        month_start = today.replace(day=1)
-        orders = orders.filter(created_at__date__gte=month_start)
-        filter_label = 'هذا الشهر'
-    elif filter_type == 'custom' and start_date and end_date:
-        try:
-            start = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end = datetime.strptime(end_date, '%Y-%m-%d').date()
-            orders = orders.filter(created_at__date__gte=start, created_at__date__lte=end)
-            filter_label = f'من {start_date} إلى {end_date}'
-        except ValueError:
-            messages.error(request, 'تاريخ غير صحيح')
-
-    # Calculate statistics
-    total_orders = orders.count()
-
-    # Calculate total revenue
-    total_revenue = Decimal('0.00')
-    for order in orders:
-        total_revenue += order.get_total_price()
-
-    # Calculate average order value
-    average_order = total_revenue / total_orders if total_orders > 0 else Decimal('0.00')
-
-    # Get orders with their totals for display
-    orders_with_totals = []
-    for order in orders.order_by('-created_at'):
-        orders_with_totals.append({
-            'order': order,
-            'total': order.get_total_price()
-        })
-
-    # Status breakdown
-    status_stats = {
-        'completed': orders.filter(status='completed').count(),
-        'cancelled': orders.filter(status='cancelled').count(),
-    }
+    # Orders table, one page at a time
+    paginator = CountedPaginator(
+        orders.select_related('customer').order_by('-created_at', '-id'),
+        DASHBOARD_PAGE_SIZE,
+        count=stats['total_orders'],
+    )
+    orders_page = await paginator.aget_page(request.GET.get('page'))
 
     context = {
-        'total_orders': total_orders,
-        'total_revenue': total_revenue,
-        'average_order': average_order,
-        'orders_with_totals': orders_with_totals,
+        'total_orders': stats['total_orders'],
+        'total_revenue': stats['total_revenue'],
+        'average_order': stats['average_order'],
+        'orders_page': orders_page,
         'filter_type': filter_type,
         'filter_label': filter_label,
         'start_date': start_date,
         'end_date': end_date,
-        'status_stats': status_stats,
+        'status_stats': stats['status_stats'],
     }
 
-    return render(request, 'store/dashboard.html', context)
+    return await _render(request, 'store/dashboard.html', context)
 
 
 @login_required
-def product_list(request):
+async def product_list(request):
     """Product list with search and filter"""
     products = Product.objects.all()
 
     # Search functionality
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        products = products.filter(name__icontains=search_query)
+        products = search(products, search_query, 'search_name')
 
     # Stock filter
     stock_filter = request.GET.get('stock', 'all')
@@ -104,79 +121,101 @@ def product_list(request):
         products = products.filter(stock__gt=0, stock__lte=10)
 
     # Sort
-    sort_by = request.GET.get('sort', '-created_at')
+    sort_by = request.GET.get('sort', '')
     valid_sorts = ['-created_at', 'created_at', 'name', '-name', 'price', '-price', 'stock', '-stock']
-    if sort_by in valid_sorts:
-        products = products.order_by(sort_by)
+    if sort_by not in valid_sorts:
+        sort_by = ''
+    # Best matches first when searching, unless a sort was picked
+    ordering = sort_by or ('-search_rank' if search_query else '-created_at')
+
+    page = await KeysetPaginator(products, ordering, LIST_PAGE_SIZE).aget_page(request.GET.get('cursor'))
 
     context = {
-        'products': products,
+        'products': page,
         'search_query': search_query,
         'stock_filter': stock_filter,
         'sort_by': sort_by,
     }
-    return render(request, 'store/product_list.html', context)
+    return await _render(request, 'store/product_list.html', context)
 
 
-@login_required
-def order_list(request):
-    """Order list with search and filter"""
+def _filtered_orders(params):
+    """The orders of order_list for the query ``params``: (queryset, the
+    filters to show, ordering)"""
     orders = Order.objects.select_related('customer').all()
 
     # Search functionality
-    search_query = request.GET.get('search', '').strip()
+    search_query = params.get('search', '').strip()
     if search_query:
-        orders = orders.filter(customer__full_name__icontains=search_query) | orders.filter(customer__phone_number__icontains=search_query)
+        orders = search(orders, search_query, 'customer__search_name', 'customer__search_phone')
 
     # Status filter
-    status_filter = request.GET.get('status', 'all')
+    status_filter = params.get('status', 'all')
     if status_filter != 'all':
         orders = orders.filter(status=status_filter)
 
     # Date filter
-    date_filter = request.GET.get('date', 'all')
+    date_filter = params.get('date', 'all')
+    today = timezone.localdate()
     if date_filter == 'today':
-        from datetime import datetime
-        today = datetime.now().date()
-        orders = orders.filter(created_at__date=today)
+        orders = orders_between(orders, today, today)
     elif date_filter == 'week':
-        from datetime import datetime, timedelta
-        today = datetime.now().date()
-        week_start = today - timedelta(days=today.weekday())
-        orders = orders.filter(created_at__date__gte=week_start)
+        orders = orders_between(orders, today - timedelta(days=today.weekday()))
     elif date_filter == 'month':
-        from datetime import datetime
-        today = datetime.now().date()
-        month_start = today.replace(day=1)
-        orders = orders.filter(created_at__date__gte=month_start)
+        orders = orders_between(orders, today.replace(day=1))
 
     # Sort
-    sort_by = request.GET.get('sort', '-created_at')
+    sort_by = params.get('sort', '')
     valid_sorts = ['-created_at', 'created_at', 'customer__full_name', '-customer__full_name']
-    if sort_by in valid_sorts:
-        orders = orders.order_by(sort_by)
+    if sort_by not in valid_sorts:
+        sort_by = ''
+    # Orders of the best matching customers first when searching
+    ordering = sort_by or ('-search_rank' if search_query else '-created_at')
 
-    context = {
-        'orders': orders,
+    filters = {
         'search_query': search_query,
         'status_filter': status_filter,
         'date_filter': date_filter,
         'sort_by': sort_by,
     }
-    return render(request, 'store/order_list.html', context)
+    return orders, filters, ordering
 
 
 @login_required
-def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-    order_items = order.items.all()
+async def order_list(request):
+    """Order list with search and filter"""
+    orders, filters, ordering = _filtered_orders(request.GET)
+
+    page = await KeysetPaginator(orders, ordering, LIST_PAGE_SIZE).aget_page(request.GET.get('cursor'))
+
+    context = {'orders': page, **filters}
+    return await _render(request, 'store/order_list.html', context)
+
+
+@login_required
+async def order_detail(request, order_id):
+    order = await aget_object_or_404(Order.objects.select_related('customer'), id=order_id)
+    order_items = [item async for item in order.items.select_related('product')]
     total_price = order.get_total_price()
     context = {
         'order': order,
         'order_items': order_items,
         'total_price': total_price
     }
-    return render(request, 'store/order_detail.html', context)
+    return await _render(request, 'store/order_detail.html', context)
+
+
+def _selected_customer(form):
+    """The customer chosen on an order form, shown again when it is re-rendered"""
+    if form.is_bound:
+        return getattr(form, 'cleaned_data', {}).get('customer')
+    return form.instance.customer if form.instance.customer_id else None
+
+
+def _order_form_context(form):
+    """The order form with the in-stock products, shared by all workers
+    through the cache (see store.caching); customers are searched as typed"""
+    return {'form': form, 'products': product_catalog(), 'selected_customer': _selected_customer(form)}
 
 
 @login_required
@@ -191,14 +230,12 @@ def create_order(request):
         # Validate form first
         if not form.is_valid():
             # Don't show generic message - field-specific errors will show
-            products = Product.objects.filter(stock__gt=0)
-            return render(request, 'store/create_order.html', {'form': form, 'products': products})
+            return render(request, 'store/create_order.html', _order_form_context(form))
 
         # Validate that we have products
         if not product_ids or not quantities:
             messages.error(request, 'يرجى إضافة منتج واحد على الأقل إلى الطلب.')
-            products = Product.objects.filter(stock__gt=0)
-            return render(request, 'store/create_order.html', {'form': form, 'products': products})
+            return render(request, 'store/create_order.html', _order_form_context(form))
 
         # Prepare order items data and validate
         order_items_data = []
@@ -214,20 +251,17 @@ def create_order(request):
                 quantity = int(quantity_str)
             except (ValueError, TypeError):
                 messages.error(request, 'بيانات غير صحيحة في المنتجات.')
-                products = Product.objects.filter(stock__gt=0)
-                return render(request, 'store/create_order.html', {'form': form, 'products': products})
+                return render(request, 'store/create_order.html', _order_form_context(form))
 
             # Validate quantity is positive
             if quantity <= 0:
                 messages.error(request, 'الكمية يجب أن تكون أكبر من صفر.')
-                products = Product.objects.filter(stock__gt=0)
-                return render(request, 'store/create_order.html', {'form': form, 'products': products})
+                return render(request, 'store/create_order.html', _order_form_context(form))
 
             # Check for duplicate products
             if product_id in seen_products:
                 messages.error(request, f'تم إضافة نفس المنتج أكثر من مرة. يرجى دمج الكميات.')
-                products = Product.objects.filter(stock__gt=0)
-                return render(request, 'store/create_order.html', {'form': form, 'products': products})
+                return render(request, 'store/create_order.html', _order_form_context(form))
 
             seen_products.add(product_id)
             order_items_data.append({
@@ -238,8 +272,7 @@ def create_order(request):
         # Must have at least one valid product
         if not order_items_data:
             messages.error(request, 'يرجى إضافة منتج واحد على الأقل إلى الطلب.')
-            products = Product.objects.filter(stock__gt=0)
-            return render(request, 'store/create_order.html', {'form': form, 'products': products})
+            return render(request, 'store/create_order.html', _order_form_context(form))
 
         # Use atomic transaction to ensure data consistency
         try:
@@ -247,36 +280,8 @@ def create_order(request):
                 # Create the order
                 order = form.save()
 
-                # Process each product with stock locking
-                for item_data in order_items_data:
-                    product_id = item_data['product_id']
-                    quantity = item_data['quantity']
-
-                    # Lock the product row for update to prevent race conditions
-                    try:
-                        product = Product.objects.select_for_update().get(id=product_id)
-                    except Product.DoesNotExist:
-                        # Rollback will happen automatically
-                        raise ValidationError(f'المنتج برقم {product_id} غير موجود.')
-
-                    # Check stock availability
-                    if not product.has_stock(quantity):
-                        # Rollback will happen automatically
-                        raise ValidationError(
-                            f'الكمية المطلوبة من "{product.name}" غير متوفرة. '
-                            f'المطلوب: {quantity}، المتوفر: {product.stock}'
-                        )
-
-                    # Create order item
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=quantity,
-                        price=product.price
-                    )
-
-                    # Decrease stock
-                    product.decrease_stock(quantity)
+                # Lock, validate and take all products out of stock in one batch
+                reserve_stock(order, {item['product_id']: item['quantity'] for item in order_items_data})
 
                 # If we reach here, everything is successful
                 messages.success(request, f'تم إنشاء الطلب #{order.id} بنجاح!')
@@ -293,21 +298,13 @@ def create_order(request):
             messages.error(request, f'حدث خطأ أثناء إنشاء الطلب: {str(e)}')
 
         # If we reach here, there was an error
-        products = Product.objects.filter(stock__gt=0)
-        return render(request, 'store/create_order.html', {'form': form, 'products': products})
+        return render(request, 'store/create_order.html', _order_form_context(form))
 
     else:
         # GET request - show form
         form = OrderForm()
 
-    products = Product.objects.filter(stock__gt=0)
-    customers = Customer.objects.all().order_by('full_name')
-    context = {
-        'form': form,
-        'products': products,
-        'customers': customers
-    }
-    return render(request, 'store/create_order.html', context)
+    return render(request, 'store/create_order.html', _order_form_context(form))
 
 
 # ================== PRODUCT MANAGEMENT ==================
@@ -352,6 +349,23 @@ def edit_product(request, product_id):
     })
 
 
+@login_required
+def product_thumbnail(request, product_id, width, fmt):
+    """Make the thumbnails of a product image that has none yet (uploaded
+    before store.images, or its thumbnails failed) and redirect to one"""
+    if width not in THUMBNAIL_WIDTHS or fmt not in THUMBNAIL_FORMATS:
+        raise Http404
+    product = get_object_or_404(Product.objects.only('id', 'image', 'image_hash'), id=product_id)
+    if not product.image:
+        raise Http404
+    if not product.image_hash:
+        product.refresh_thumbnails()
+    if not product.image_hash:
+        # Not an image Pillow can read: the browser may still show it
+        return redirect(product.image.url)
+    return redirect(product.image.storage.url(thumbnail_name(product.image_hash, width, fmt)))
+
+
 @login_required
 def delete_product(request, product_id):
     """Delete product"""
@@ -366,6 +380,44 @@ def delete_product(request, product_id):
     return render(request, 'store/product_confirm_delete.html', {'product': product})
 
 
+@login_required
+def import_products(request):
+    """Add and update products from a CSV sheet: upload, preview the changes, confirm"""
+    form = ProductImportForm()
+    if request.method == 'POST' and request.POST.get('token'):
+        token = request.POST['token']
+        try:
+            path = upload_path(token)
+            result = run_import(path.read_bytes(), apply=True)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            if result['applied']:
+                path.unlink(missing_ok=True)
+                counts = result['counts']
+                messages.success(
+                    request, f'تم استيراد المنتجات: {counts["insert"]} منتج جديد و{counts["update"]} منتج محدث.'
+                )
+                return redirect('store:product_list')
+            # The products changed since the preview and some rows no longer pass
+            messages.error(request, 'يحتوي الملف على أخطاء، لم يتم حفظ أي تغيير.')
+            return render(request, 'store/product_import.html', {'form': form, 'result': result, 'token': token})
+    elif request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = run_import(upload.read())
+            except ValidationError as e:
+                form.add_error('file', e)
+            else:
+                token = save_upload(upload) if not result['counts']['error'] else None
+                return render(request, 'store/product_import.html', {'form': form, 'result': result, 'token': token})
+        messages.error(request, 'يرجى تصحيح الأخطاء في النموذج.')
+
+    return render(request, 'store/product_import.html', {'form': form})
+
+
 # ================== ORDER MANAGEMENT ==================
 
 @login_required
@@ -376,9 +428,16 @@ def edit_order(request, order_id):
     if request.method == 'POST':
         form = OrderForm(request.POST, instance=order)
         if form.is_valid():
-            order = form.save()
-            messages.success(request, f'تم تحديث الطلب #{order.id} بنجاح!')
-            return redirect('store:order_detail', order_id=order.id)
+            try:
+                with transaction.atomic():
+                    order = form.save()
+                    # Cancelling returns the items to stock, reopening takes them again
+                    sync_order_stock(order)
+            except ValidationError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f'تم تحديث الطلب #{order.id} بنجاح!')
+                return redirect('store:order_detail', order_id=order.id)
         else:
             messages.error(request, 'يرجى تصحيح الأخطاء في النموذج.')
     else:
@@ -386,7 +445,8 @@ def edit_order(request, order_id):
 
     return render(request, 'store/order_form.html', {
         'form': form,
-        'order': order
+        'order': order,
+        'selected_customer': _selected_customer(form)
     })
 
 
@@ -396,11 +456,9 @@ def delete_order(request, order_id):
     order = get_object_or_404(Order, id=order_id)
 
     if request.method == 'POST':
-        # Restore stock for all items
+        # Restore stock for all items (unless a cancellation already did)
         with transaction.atomic():
-            for item in order.items.all():
-                product = item.product
-                product.increase_stock(item.quantity)
+            release_stock(Order.objects.filter(pk=order.pk))
 
             order_number = order.id
             order.delete()
@@ -411,52 +469,74 @@ def delete_order(request, order_id):
     total_price = order.get_total_price()
     return render(request, 'store/order_confirm_delete.html', {
         'order': order,
+        'order_items': order.items.select_related('product'),
         'total_price': total_price
     })
 
 
 # ================== CUSTOMER MANAGEMENT ==================
 
-@login_required
-def customer_list(request):
-    """Customer list with search"""
+def _filtered_customers(params):
+    """The customers of customer_list for the query ``params``: (queryset,
+    the filters to show, ordering)"""
     customers = Customer.objects.all()
 
     # Search functionality
-    search_query = request.GET.get('search', '').strip()
+    search_query = params.get('search', '').strip()
     if search_query:
-        customers = customers.filter(full_name__icontains=search_query) | customers.filter(phone_number__icontains=search_query)
+        customers = search(customers, search_query, 'search_name', 'search_phone')
 
     # Sort
-    sort_by = request.GET.get('sort', 'full_name')
+    sort_by = params.get('sort', '')
     valid_sorts = ['full_name', '-full_name', 'created_at', '-created_at']
-    if sort_by in valid_sorts:
-        customers = customers.order_by(sort_by)
+    if sort_by not in valid_sorts:
+        sort_by = ''
+    # Best matches first when searching, unless a sort was picked
+    ordering = sort_by or ('-search_rank' if search_query else 'full_name')
 
-    context = {
-        'customers': customers,
-        'search_query': search_query,
-        'sort_by': sort_by,
-    }
-    return render(request, 'store/customer_list.html', context)
+    return customers, {'search_query': search_query, 'sort_by': sort_by}, ordering
+
+
+@login_required
+async def customer_autocomplete(request):
+    """Customers matching ``q`` with their balance, for the order forms' customer search"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    if not query or limit < 1:
+        return JsonResponse({'results': []})
+    return JsonResponse({'results': await acustomer_suggestions(query, limit)})
 
 
 @login_required
-def customer_detail(request, customer_id):
+async def customer_list(request):
+    """Customer list with search"""
+    customers, filters, ordering = _filtered_customers(request.GET)
+
+    page = await KeysetPaginator(customers, ordering, LIST_PAGE_SIZE).aget_page(request.GET.get('cursor'))
+
+    context = {'customers': page, **filters}
+    return await _render(request, 'store/customer_list.html', context)
+
+
+@login_required
+async def customer_detail(request, customer_id):
     """Customer detail with order history"""
-    customer = get_object_or_404(Customer, id=customer_id)
-    orders = customer.orders.all().order_by('-created_at')
-    
-    total_debt = customer.get_total_debt()
-    total_orders = orders.count()
-    
+    customer = await aget_object_or_404(Customer, id=customer_id)
+    orders = [order async for order in customer.orders.all().order_by('-created_at')]
+
+    total_debt = customer.total_debt
+    total_orders = customer.order_count
+
     context = {
         'customer': customer,
         'orders': orders,
         'total_debt': total_debt,
         'total_orders': total_orders,
     }
-    return render(request, 'store/customer_detail.html', context)
+    return await _render(request, 'store/customer_detail.html', context)
 
 
 @login_required
@@ -470,7 +550,6 @@ def customer_create(request):
             
             # If it's an AJAX request, return success
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                from django.http import JsonResponse
                 return JsonResponse({
                     'success': True,
                     'customer_id': customer.id,
@@ -482,7 +561,6 @@ def customer_create(request):
         else:
             # If AJAX, return errors
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                from django.http import JsonResponse
                 return JsonResponse({
                     'success': False,
                     'errors': form.errors
@@ -534,3 +612,34 @@ def customer_delete(request, customer_id):
         return redirect('store:customer_list')
 
     return render(request, 'store/customer_confirm_delete.html', {'customer': customer})
+
+
+# ================== EXPORTS ==================
+
+def _export_filename(name):
+    return f'{name}-{timezone.localdate():%Y-%m-%d}.csv'
+
+
+@login_required
+def export_orders(request):
+    """CSV of the orders (one row per item) matching the order_list or dashboard filters"""
+    orders, filters, ordering = _filtered_orders(request.GET)
+    start, end, _ = _dashboard_range(request.GET)
+    orders = orders_between(orders, start, end)
+    orders = orders.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+    return csv_response(_export_filename('orders'), ORDER_HEADER, order_rows(orders))
+
+
+@login_required
+def export_customers(request):
+    """CSV of the customers and their balances matching the customer_list filters"""
+    customers, filters, ordering = _filtered_customers(request.GET)
+    customers = customers.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+    return csv_response(_export_filename('customers'), CUSTOMER_HEADER, customer_rows(customers))
+
+
+@login_required
+def customer_statement(request, customer_id):
+    """CSV statement of a customer's orders with the running balance"""
+    customer = get_object_or_404(Customer, id=customer_id)
+    return csv_response(_export_filename(f'statement-{customer.id}'), STATEMENT_HEADER, statement_rows(customer))
@@ -6,3 +6,6 @@ class UsersConfig(AppConfig):
     name = 'users'
     verbose_name = 'إدارة المستخدمين'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+
@@ -1,9 +1,26 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
 
 UserModel = get_user_model()
 
+# How long a looked up user is reused; saving or deleting the user drops it
+# right away (see users.signals), so this only bounds updates made without
+# signals, such as queryset update()
+USER_CACHE_TIMEOUT = 60 * 60
+
+
+def _user_key(user_id):
+    return f'users:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Drop the cached copy of the user, now and once the transaction commits"""
+    cache.delete(_user_key(user_id))
+    # A request reading the user before the commit would cache the old row
+    transaction.on_commit(lambda: cache.delete(_user_key(user_id)))
+
 
 class EmailBackend(ModelBackend):
     """
@@ -12,8 +29,7 @@ class EmailBackend(ModelBackend):
     
     def authenticate(self, request, username=None, password=None, **kwargs):
         try:
-            # Try to fetch the user by searching the username or email field
-            user = UserModel.objects.get(Q(email__iexact=username) | Q(email__iexact=username))
+            user = UserModel.objects.with_email(username).get()
             
             if user.check_password(password) and self.user_can_authenticate(user):
                 return user
@@ -22,15 +38,35 @@ class EmailBackend(ModelBackend):
             # difference between an existing and a nonexistent user (#20760).
             UserModel().set_password(password)
             return None
-        except UserModel.MultipleObjectsReturned:
-            # Handle multiple users with same email (shouldn't happen with unique constraint)
-            return None
         
         return None
 
     def get_user(self, user_id):
-        try:
-            return UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
-            return None
+        """The user of a session, from the cache when it was looked up before,
+        so an authenticated page runs no query for it.
+
+        Looked up on the primary even on replica-routed pages: a lagging
+        replica's copy, cached after invalidate_user(), would bring the old
+        row back for the whole timeout.
+        """
+        user = cache.get(_user_key(user_id))
+        if user is None:
+            try:
+                user = UserModel.objects.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(_user_key(user_id), user, USER_CACHE_TIMEOUT)
+        # As ModelBackend: a deactivated user is logged out on the next request
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        """get_user() for the async views (request.auser())"""
+        user = await cache.aget(_user_key(user_id))
+        if user is None:
+            try:
+                user = await UserModel.objects.using(DEFAULT_DB_ALIAS).aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            await cache.aset(_user_key(user_id), user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
 
@@ -58,8 +58,8 @@ class UserRegistrationForm(BaseUserCreationForm):
         fields = ('email', 'first_name', 'last_name', 'phone_number', 'password1', 'password2')
 
     def clean_email(self):
-        email = self.cleaned_data.get('email')
-        if CustomUser.objects.filter(email=email).exists():
+        email = CustomUser.objects.normalize_email(self.cleaned_data.get('email'))
+        if CustomUser.objects.with_email(email).exists():
             raise forms.ValidationError('هذا البريد الإلكتروني مسجل بالفعل')
         return email
 
@@ -119,3 +119,9 @@ class UserUpdateForm(forms.ModelForm):
         model = CustomUser
         fields = ('email', 'first_name', 'last_name', 'phone_number')
 
+    def clean_email(self):
+        email = CustomUser.objects.normalize_email(self.cleaned_data.get('email'))
+        if CustomUser.objects.with_email(email).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError('هذا البريد الإلكتروني مسجل بالفعل')
+        return email
+
@@ -0,0 +1,114 @@
+import json
+import random
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from store.benchmarking import ISOLATED_CACHES, latency_summary
+from store.seeding import copy_rows
+
+# Only the lookup is measured: a cheap hasher keeps password checks out of
+# the timings (the real hasher costs far more per login)
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+BENCH_PASSWORD = 'bench-password'
+
+
+def _plan_summary(node):
+    """Scan nodes of a plan, e.g. 'Index Scan using user_email_lower_uniq'"""
+    scans = []
+    if 'Scan' in node['Node Type']:
+        scans.append(' using '.join(filter(None, [node['Node Type'], node.get('Index Name')])))
+    for child in node.get('Plans', []):
+        scans.extend(_plan_summary(child))
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the login lookup on a large throwaway user table: the old '
+        'email__iexact lookup against CustomUserManager.with_email(), with their '
+        'plans, then authenticate() end to end. Everything runs in one transaction '
+        'that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200000, help='Users to create (default: 200000)')
+        parser.add_argument('--logins', type=int, default=500, help='Lookups timed per variant (default: 500)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The login benchmark needs PostgreSQL.')
+        if options['users'] < 1 or options['logins'] < 1:
+            raise CommandError('--users and --logins must be positive.')
+
+        User = get_user_model()
+        rng = random.Random(options['seed'])
+        with transaction.atomic(), override_settings(CACHES=ISOLATED_CACHES, PASSWORD_HASHERS=FAST_HASHERS):
+            self.stdout.write(f"Creating {options['users']:,} users...")
+            self.seed_users(options['users'])
+            # Logins as typed: any case, sometimes with a stray space
+            emails = [
+                rng.choice(['', ' ']) + f'Bench.User{rng.randrange(options["users"])}@Example.COM'
+                for _ in range(options['logins'])
+            ]
+
+            variants = {
+                'email__iexact': lambda email: User.objects.filter(email__iexact=email.strip()),
+                'with_email': lambda email: User.objects.with_email(email),
+            }
+            for label, lookup in variants.items():
+                self.explain(label, lookup(emails[0]))
+                durations = []
+                for email in emails:
+                    started = time.perf_counter()
+                    lookup(email).get()
+                    durations.append(time.perf_counter() - started)
+                self.report(label, durations)
+
+            durations = []
+            for email in emails:
+                started = time.perf_counter()
+                if authenticate(username=email, password=BENCH_PASSWORD) is None:
+                    raise CommandError(f'{email!r} could not log in.')
+                durations.append(time.perf_counter() - started)
+            self.report('authenticate()', durations)
+            transaction.set_rollback(True)
+
+    def seed_users(self, count):
+        password = make_password(BENCH_PASSWORD)
+        joined = timezone.now().isoformat()
+        with connection.cursor() as cursor:
+            copy_rows(
+                cursor,
+                get_user_model(),
+                ['password', 'is_superuser', 'email', 'first_name', 'last_name', 'phone_number',
+                 'is_staff', 'is_active', 'date_joined'],
+                (
+                    [password, 'f', f'bench.user{n}@example.com', 'Bench', str(n), '', 'f', 't', joined]
+                    for n in range(count)
+                ),
+            )
+            cursor.execute(f'ANALYZE {get_user_model()._meta.db_table}')
+
+    def explain(self, label, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+            explain = cursor.fetchone()[0]
+            if isinstance(explain, str):
+                explain = json.loads(explain)
+        plan = explain[0]
+        self.stdout.write(f"{label}: {', '.join(_plan_summary(plan['Plan']))} ({plan['Execution Time']:.2f} ms)")
+
+    def report(self, label, durations):
+        summary = latency_summary(durations)
+        self.stdout.write(
+            f"  {label}: mean {summary['mean_ms']:.2f}ms  p50 {summary['p50_ms']:.2f}ms  "
+            f"p95 {summary['p95_ms']:.2f}ms  p99 {summary['p99_ms']:.2f}ms"
+        )
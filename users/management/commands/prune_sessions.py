@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.sessions import PRUNE_BATCH_SIZE, prune_expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions in batches (clearsessions in one statement would lock '
+        'the whole backlog at once). Logins already do this in the background every hour.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PRUNE_BATCH_SIZE,
+            help=f'Sessions deleted per statement (default: {PRUNE_BATCH_SIZE})',
+        )
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds between batches (default: 0.05)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['pause'] < 0:
+            raise CommandError('--batch-size must be positive and --pause not negative.')
+        deleted = prune_expired_sessions(options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted:,} expired sessions.'))
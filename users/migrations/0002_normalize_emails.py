@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:00
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def normalize_emails(apps, schema_editor):
+    """Store every email stripped and lowercased (CustomUserManager.normalize_email)"""
+    CustomUser = apps.get_model('users', 'CustomUser')
+    duplicates = list(
+        CustomUser.objects.values(address=Lower(Trim('email')))
+        .annotate(users=Count('id')).filter(users__gt=1).values_list('address', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            'These addresses belong to several users when case is ignored; merge or '
+            f'rename those accounts first: {", ".join(duplicates)}'
+        )
+    CustomUser.objects.update(email=Lower(Trim('email')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(
+                Lower('email'),
+                name='user_email_lower_uniq',
+                violation_error_message='هذا البريد الإلكتروني مسجل بالفعل',
+            ),
+        ),
+    ]
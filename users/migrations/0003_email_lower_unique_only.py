@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_normalize_emails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='email',
+            field=models.EmailField(max_length=254, verbose_name='عنوان البريد الإلكتروني'),
+        ),
+    ]
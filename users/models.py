@@ -1,11 +1,26 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
 class CustomUserManager(BaseUserManager):
     """Custom user manager where email is the unique identifier"""
-    
+
+    @classmethod
+    def normalize_email(cls, email):
+        """The stored form of an email address: stripped and lowercased,
+        local part included, so one address cannot be registered twice"""
+        return (email or '').strip().lower()
+
+    def with_email(self, email):
+        """The users with ``email``, in any case. The one canonical lookup
+        of an address, served by the unique index on LOWER(email)"""
+        return self.alias(email_lower=Lower('email')).filter(email_lower=self.normalize_email(email))
+
+    def get_by_natural_key(self, username):
+        return self.with_email(username).get()
+
     def create_user(self, email, password=None, **extra_fields):
         """Create and save a regular user with the given email and password"""
         if not email:
@@ -33,7 +48,8 @@ class CustomUserManager(BaseUserManager):
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     """Custom user model that uses email as username"""
     
-    email = models.EmailField('عنوان البريد الإلكتروني', unique=True)
+    # Unique through user_email_lower_uniq (see Meta)
+    email = models.EmailField('عنوان البريد الإلكتروني')
     first_name = models.CharField('الاسم الأول', max_length=150, blank=True)
     last_name = models.CharField('اسم العائلة', max_length=150, blank=True)
     phone_number = models.CharField('رقم الهاتف', max_length=20, blank=True)
@@ -50,10 +66,24 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = 'مستخدم'
         verbose_name_plural = 'المستخدمون'
+        constraints = [
+            # One account per address whatever its case; also the index of
+            # CustomUserManager.with_email() (logins, registration)
+            models.UniqueConstraint(
+                Lower('email'),
+                name='user_email_lower_uniq',
+                violation_error_message='هذا البريد الإلكتروني مسجل بالفعل',
+            ),
+        ]
 
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        # Every way in (forms, admin, shell) stores the normalized address
+        self.email = CustomUser.objects.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
     def get_full_name(self):
         """Return the first_name plus the last_name, with a space in between"""
         full_name = f'{self.first_name} {self.last_name}'
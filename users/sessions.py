@@ -0,0 +1,29 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+# Seconds between two background prunes (see users.signals)
+PRUNE_INTERVAL = 60 * 60
+# Sessions deleted per statement: small enough that no batch holds its
+# locks or bloats the WAL for long
+PRUNE_BATCH_SIZE = 1000
+
+
+def prune_expired_sessions(batch_size=PRUNE_BATCH_SIZE, pause=0.05):
+    """Delete the expired sessions in batches of ``batch_size`` rows, each in
+    its own short statement with ``pause`` seconds in between, and return
+    how many were deleted.
+
+    clearsessions deletes them all in one statement, which on a table that
+    was never pruned locks thousands of rows and runs for a long time.
+    """
+    now = timezone.now()
+    deleted = 0
+    while True:
+        expired = Session.objects.filter(expire_date__lt=now).values('pk')[:batch_size]
+        count, _ = Session.objects.filter(pk__in=expired).delete()
+        deleted += count
+        if count < batch_size:
+            return deleted
+        time.sleep(pause)
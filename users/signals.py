@@ -0,0 +1,39 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_user
+from .sessions import PRUNE_INTERVAL, prune_expired_sessions
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached copy used by EmailBackend.get_user(): a changed
+    password, is_active or is_staff takes effect on the next request"""
+    invalidate_user(instance.pk)
+
+
+def _prune_sessions():
+    try:
+        prune_expired_sessions()
+    finally:
+        # The thread's own connection, back to the pool
+        connections.close_all()
+
+
+@receiver(user_logged_in)
+def prune_sessions_in_background(sender, request, user, **kwargs):
+    """Delete expired sessions in a background thread, at most once every
+    PRUNE_INTERVAL across all the workers.
+
+    Logins are what add sessions, so the table is kept in check at the
+    rate it grows, without a scheduler and without slowing the login.
+    """
+    if cache.add('users:sessions:pruning', True, PRUNE_INTERVAL):
+        threading.Thread(target=_prune_sessions, name='prune-sessions', daemon=True).start()
@@ -0,0 +1,92 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+
+from store.benchmarking import ISOLATED_CACHES
+
+from .backends import EmailBackend
+
+User = get_user_model()
+
+
+class UserEmailTests(TestCase):
+    """Emails are stored normalized and unique whatever their case"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='  Ali.Hassan@Example.COM ', password='secret-123', first_name='Ali')
+
+    def test_save_normalizes_the_email(self):
+        self.assertEqual(self.user.email, 'ali.hassan@example.com')
+        self.user.email = 'Ali.H@Example.com'
+        self.user.save()
+        self.assertEqual(User.objects.get(pk=self.user.pk).email, 'ali.h@example.com')
+
+    def test_natural_key_ignores_case(self):
+        self.assertEqual(User.objects.get_by_natural_key('ALI.HASSAN@example.com'), self.user)
+        self.assertEqual(User.objects.with_email(' ali.hassan@EXAMPLE.com').get(), self.user)
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_natural_key('ali@example.com')
+
+    def test_login_ignores_case(self):
+        self.assertEqual(authenticate(username='Ali.Hassan@example.com', password='secret-123'), self.user)
+
+    def test_unique_whatever_the_case(self):
+        # Stored without save(), as rows from before the normalization were
+        User.objects.filter(pk=self.user.pk).update(email='Ali.Hassan@Example.com')
+        with self.assertRaisesMessage(ValidationError, 'هذا البريد الإلكتروني مسجل بالفعل'):
+            User(email='ali.hassan@example.com').validate_constraints()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(email='ali.hassan@example.com')
+
+    def test_email_has_one_unique_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexdef ILIKE %s',
+                [User._meta.db_table, '%email%'],
+            )
+            self.assertEqual([row[0] for row in cursor.fetchall()], ['user_email_lower_uniq'])
+
+
+@override_settings(CACHES=ISOLATED_CACHES)
+class UserCacheTests(TestCase):
+    """EmailBackend.get_user() serves the user from the cache until it changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='clerk@example.com', first_name='Clerk')
+        self.backend = EmailBackend()
+
+    def test_cached_after_the_first_lookup(self):
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_saving_drops_the_cached_user(self):
+        self.backend.get_user(self.user.pk)
+        self.user.first_name = 'Manager'
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertNumQueries(1):
+            cached = self.backend.get_user(self.user.pk)
+        self.assertEqual((cached.first_name, cached.is_staff), ('Manager', True))
+
+    def test_deactivated_user_is_logged_out(self):
+        self.backend.get_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_deleting_drops_the_cached_user(self):
+        self.backend.get_user(self.user.pk)
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertIsNone(self.backend.get_user(user_id))
+
+    def test_async_lookup_shares_the_cache(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(self.backend.aget_user)(self.user.pk), self.user)